@@ -0,0 +1,242 @@
+"""
+analytics.py
+
+Vectorized count, group-by, cross-tab and top-k analytics over all contacts
+of an AddressBookSystem, built on NumPy.
+
+A ContactAnalytics snapshot dictionary-encodes the city, state, ZIP code and
+address book of every contact into integer code arrays once, after which each
+aggregate is a single np.bincount or np.unique call. Requires NumPy.
+
+Classes:
+- ContactAnalytics: An immutable, vectorized snapshot of a system's contacts.
+- LiveAnalytics: An observer that rebuilds the snapshot only after changes.
+"""
+
+import numpy as np
+
+from address_book_system import AddressBookObserver
+
+FIELDS = ("city", "state", "zip_code", "book")
+
+
+class _Encoder:
+    """
+    Assigns consecutive integer codes to distinct values.
+    """
+
+    def __init__(self):
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.codes)
+        return code
+
+    def labels(self):
+        return np.array(list(self.codes), dtype=object)
+
+
+class ContactAnalytics:
+    """
+    A snapshot of every contact's city, state, ZIP code and address book as
+    NumPy categorical code arrays.
+
+    Attributes:
+        codes (dict): Maps each field in FIELDS to an integer array holding
+            one code per contact.
+        labels (dict): Maps each field to an array of its distinct values,
+            indexed by code.
+        rows (np.ndarray): The position of each contact within its address book.
+    """
+
+    def __init__(self, codes, labels, rows, books):
+        """
+        Initializes a snapshot from already encoded arrays. Use `from_system`.
+        """
+        self.codes = codes
+        self.labels = labels
+        self.rows = rows
+        self._books = books
+
+    @classmethod
+    def from_system(cls, system):
+        """
+        Encodes all contacts of an AddressBookSystem.
+
+        Books stored column by column (see columnar_store) are encoded by
+        remapping their existing code arrays, without building Contact objects.
+
+        Args:
+            system (AddressBookSystem): The system to analyze.
+
+        Returns:
+            ContactAnalytics: The snapshot.
+        """
+        encoders = {field: _Encoder() for field in FIELDS}
+        parts = {field: [] for field in FIELDS}
+        rows = []
+        books = []
+        for book_name, book in system.books.items():
+            books.append(book)
+            book_code = encoders["book"].encode(book_name)
+            size = len(book.contacts)
+            columns = getattr(book, "columns", None)
+            for field in FIELDS[:-1]:
+                if columns is not None:
+                    column = columns[field]
+                    remap = np.fromiter((encoders[field].encode(v) for v in column.values),
+                                        dtype=np.int64, count=len(column.values))
+                    local = np.frombuffer(column.codes, dtype=np.uint32)
+                    parts[field].append(remap[local] if size else np.empty(0, dtype=np.int64))
+                else:
+                    encode = encoders[field].encode
+                    parts[field].append(np.fromiter((encode(getattr(c, field)) for c in book.contacts),
+                                                    dtype=np.int64, count=size))
+            parts["book"].append(np.full(size, book_code, dtype=np.int64))
+            rows.append(np.arange(size, dtype=np.int64))
+
+        def concat(arrays):
+            return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+        codes = {field: concat(parts[field]) for field in FIELDS}
+        labels = {field: encoders[field].labels() for field in FIELDS}
+        return cls(codes, labels, concat(rows), books)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _check(self, field):
+        if field not in FIELDS:
+            raise ValueError(f"Cannot aggregate by '{field}'. Choose one of {', '.join(FIELDS)}.")
+
+    def counts(self, field):
+        """
+        Counts contacts per value of a field.
+
+        Args:
+            field (str): One of FIELDS.
+
+        Returns:
+            np.ndarray: The number of contacts per code of `field`.
+        """
+        self._check(field)
+        return np.bincount(self.codes[field], minlength=len(self.labels[field]))
+
+    def count_by(self, field):
+        """
+        Counts contacts per value of a field.
+
+        Args:
+            field (str): One of FIELDS.
+
+        Returns:
+            dict: A dictionary mapping each value to its contact count, in the
+            same form as AddressBookSystem.count_by_city.
+        """
+        counts = self.counts(field)
+        present = np.flatnonzero(counts)
+        return dict(zip(self.labels[field][present].tolist(), counts[present].tolist()))
+
+    def group_by(self, field):
+        """
+        Groups contact positions by value of a field.
+
+        Args:
+            field (str): One of FIELDS.
+
+        Returns:
+            dict: Maps each value to an array of snapshot row numbers; pass them
+            to `entries` to get the contacts.
+        """
+        self._check(field)
+        order = np.argsort(self.codes[field], kind="stable")
+        values, starts = np.unique(self.codes[field][order], return_index=True)
+        groups = np.split(order, starts[1:])
+        return dict(zip(self.labels[field][values].tolist(), groups))
+
+    def crosstab(self, row_field, column_field):
+        """
+        Counts contacts for every combination of two fields, e.g. state x book.
+
+        Args:
+            row_field (str): The field whose values label the rows.
+            column_field (str): The field whose values label the columns.
+
+        Returns:
+            tuple: (row_labels, column_labels, counts), where counts is a 2-D
+            integer array of shape (len(row_labels), len(column_labels)).
+        """
+        self._check(row_field)
+        self._check(column_field)
+        n_rows, n_columns = len(self.labels[row_field]), len(self.labels[column_field])
+        combined = self.codes[row_field] * n_columns + self.codes[column_field]
+        counts = np.bincount(combined, minlength=n_rows * n_columns).reshape(n_rows, n_columns)
+        return self.labels[row_field], self.labels[column_field], counts
+
+    def top_k(self, field, k=10):
+        """
+        Finds the `k` most common values of a field.
+
+        Args:
+            field (str): One of FIELDS.
+            k (int): The number of values to return.
+
+        Returns:
+            list: (value, count) tuples, most common first.
+        """
+        counts = self.counts(field)
+        k = min(k, len(counts))
+        if k <= 0:
+            return []
+        top = np.argpartition(-counts, k - 1)[:k]
+        top = top[np.lexsort((top, -counts[top]))]
+        return [(self.labels[field][code], int(counts[code])) for code in top if counts[code]]
+
+    def entries(self, rows):
+        """
+        Builds the (book_name, contact) pairs for snapshot row numbers.
+
+        Args:
+            rows (iterable): Row numbers, e.g. a group from `group_by`.
+
+        Returns:
+            list: A list of (book_name, contact) tuples.
+        """
+        book_labels = self.labels["book"]
+        return [(book_labels[self.codes["book"][row]],
+                 self._books[self.codes["book"][row]].contacts[self.rows[row]])
+                for row in rows]
+
+
+class LiveAnalytics(AddressBookObserver):
+    """
+    Keeps a ContactAnalytics snapshot for a system and rebuilds it only when
+    a contact or book has changed since the last call to `snapshot`.
+    """
+
+    def __init__(self, system):
+        """
+        Registers the observer on the system.
+
+        Args:
+            system (AddressBookSystem): The system to analyze.
+        """
+        self._system = system
+        self._snapshot = None
+        system.add_observer(self)
+
+    def snapshot(self):
+        """
+        Returns:
+            ContactAnalytics: An up-to-date snapshot of the system.
+        """
+        if self._snapshot is None:
+            self._snapshot = ContactAnalytics.from_system(self._system)
+        return self._snapshot
+
+    def _invalidate(self, *args):
+        self._snapshot = None
+
+    book_added = contact_added = contact_removed = contact_updated = _invalidate
@@ -0,0 +1,400 @@
+"""
+benchmark.py
+
+Benchmarks for the hot paths of AddressBook and AddressBookSystem.
+
+Each benchmark runs on synthetic contacts at every requested size and records
+the best wall-clock time over a few repeats. Results are written as JSON, and
+a previous results file can be given to flag regressions:
+
+    python benchmark.py --sizes 1000 100000 --output new.json
+    python benchmark.py --sizes 1000 100000 --compare old.json --threshold 0.2
+
+With --compare, the exit status is 1 if any benchmark is slower than in the
+baseline by more than the threshold.
+
+Startup benchmarks import a module in a fresh interpreter with
+`python -X importtime` and record its cumulative import time, once per run
+rather than per size.
+
+Functions:
+- generate_contacts: Build deterministic synthetic contacts.
+- import_time: Measure how long a module takes to import.
+- run_benchmarks: Run benchmarks and return their results.
+- compare_results: Find regressions between two results.
+"""
+
+import argparse
+import io
+import json
+import platform
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from address_book_system import AddressBook, AddressBookSystem, Contact
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+
+CITIES = ("Mumbai", "Delhi", "Chennai", "Kolkata", "Pune", "Kochi", "Jaipur", "Indore",
+          "Bhopal", "Nagpur", "Surat", "Lucknow", "Patna", "Ranchi", "Mysore", "Madurai")
+STATES = ("Maharashtra", "Delhi", "Tamil Nadu", "West Bengal", "Kerala", "Rajasthan",
+          "Madhya Pradesh", "Gujarat", "Uttar Pradesh", "Bihar", "Jharkhand", "Karnataka")
+LAST_NAMES = ("Sharma", "Iyer", "Nair", "Rao", "Gupta", "Das", "Mehta", "Reddy", "Khan", "Singh")
+
+# Number of contacts edited or deleted per run, and of books in the system.
+SAMPLE_SIZE = 1000
+SYSTEM_BOOKS = 4
+
+# Slowdowns smaller than this many seconds are not reported as regressions.
+MIN_DIFFERENCE = 0.001
+
+BENCHMARKS = {}
+
+# Startup benchmarks: the module each one imports.
+STARTUP_BENCHMARKS = {
+    "import_main": "main",
+    "import_address_book_system": "address_book_system",
+}
+
+
+def benchmark(name):
+    """
+    Registers a benchmark. The decorated function takes a _Workload and
+    returns a zero-argument function, which is the part that is timed.
+    """
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _letters(number):
+    """
+    Returns:
+        str: A lowercase alphabetic encoding of a non-negative integer.
+    """
+    letters = ""
+    while True:
+        number, digit = divmod(number, 26)
+        letters = string.ascii_lowercase[digit] + letters
+        if not number:
+            return letters
+
+
+def generate_contacts(count, seed=0):
+    """
+    Builds `count` valid contacts with unique names, deterministically.
+
+    Args:
+        count (int): The number of contacts.
+        seed (int): The random seed.
+
+    Returns:
+        list: The Contact objects.
+    """
+    rng = random.Random(seed)
+    contacts = []
+    for i in range(count):
+        city = rng.choice(CITIES)
+        contacts.append(Contact.from_trusted({
+            "first_name": "X" + _letters(i),
+            "last_name": rng.choice(LAST_NAMES),
+            "address": f"{rng.randint(1, 999)} Main Road",
+            "city": city,
+            "state": rng.choice(STATES),
+            "zip_code": str(rng.randint(110000, 859999)),
+            "phone_number": f"+91 9{rng.randint(0, 999999999):09d}",
+            "email": f"user{i}@{city.lower()}.example.com",
+        }))
+    return contacts
+
+
+class _Workload:
+    """
+    The contacts of one size, with a filled book and system built once and
+    shared by the benchmarks that do not modify them.
+    """
+
+    def __init__(self, size, workdir):
+        self.size = size
+        self.workdir = Path(workdir)
+        self.contacts = generate_contacts(size)
+        self._book = None
+        self._system = None
+        self._files = {}
+
+    def new_book(self):
+        book = AddressBook()
+        for contact in self.contacts:
+            book._insert(contact.model_copy())
+        return book
+
+    @property
+    def book(self):
+        if self._book is None:
+            self._book = self.new_book()
+        return self._book
+
+    @property
+    def system(self):
+        if self._system is None:
+            self._system = AddressBookSystem()
+            for i in range(SYSTEM_BOOKS):
+                self._system.add_address_book(f"Book{i}")
+            for i, contact in enumerate(self.contacts):
+                self._system.books[f"Book{i % SYSTEM_BOOKS}"]._insert(contact.model_copy())
+        return self._system
+
+    def sample(self):
+        return self.contacts[::max(1, self.size // SAMPLE_SIZE)][:SAMPLE_SIZE]
+
+    def exported(self, extension):
+        """
+        Returns:
+            Path: A file holding the shared book in the given format.
+        """
+        if extension not in self._files:
+            path = self.workdir / f"source_{self.size}.{extension}"
+            getattr(self.book, f"export_to_{extension}")(path)
+            self._files[extension] = path
+        return self._files[extension]
+
+    def exported_all(self):
+        """
+        Returns:
+            Path: A text file holding every book of the shared system.
+        """
+        if "all" not in self._files:
+            path = self.workdir / f"source_all_{self.size}.txt"
+            self.system.export_all_to_txt(path)
+            self._files["all"] = path
+        return self._files["all"]
+
+
+# Single-contact operations
+@benchmark("add_contact")
+def _add_contact(work):
+    book = AddressBook()
+    return lambda: [book.add_contact(contact) for contact in work.contacts]
+
+
+@benchmark("edit_contact_by_name")
+def _edit_contact(work):
+    book = work.new_book()
+    sample = work.sample()
+    return lambda: [book.edit_contact_by_name(c.first_name, c.last_name, {"city": "Agra"}) for c in sample]
+
+
+@benchmark("delete_contact_by_name")
+def _delete_contact(work):
+    book = work.new_book()
+    sample = work.sample()
+    return lambda: [book.delete_contact_by_name(c.first_name, c.last_name) for c in sample]
+
+
+# Sorting, from a cold cache
+def _sort(method):
+    def setup(work):
+        work.book._sorted.clear()
+        return getattr(work.book, method)
+    return setup
+
+
+for _method in ("sort_by_name", "sort_by_city", "sort_by_state", "sort_by_zip"):
+    benchmark(_method)(_sort(_method))
+
+
+# System-wide searches and counts
+def _system_call(method, *args):
+    def setup(work):
+        call = getattr(work.system, method)
+        return lambda: call(*args)
+    return setup
+
+
+benchmark("search_by_city")(_system_call("search_by_city", CITIES[0]))
+benchmark("search_by_state")(_system_call("search_by_state", STATES[0]))
+benchmark("search_by_zip")(_system_call("search_by_zip", "400001"))
+benchmark("count_by_city")(_system_call("count_by_city"))
+benchmark("count_by_state")(_system_call("count_by_state"))
+benchmark("count_by_zip")(_system_call("count_by_zip"))
+
+
+# File I/O
+def _export(extension):
+    def setup(work):
+        path = work.workdir / f"export_{work.size}.{extension}"
+        return lambda: getattr(work.book, f"export_to_{extension}")(path)
+    return setup
+
+
+def _import(extension):
+    def setup(work):
+        path = work.exported(extension)
+        book = AddressBook()
+        return lambda: getattr(book, f"import_from_{extension}")(path)
+    return setup
+
+
+for _extension in ("csv", "json", "txt"):
+    benchmark(f"export_to_{_extension}")(_export(_extension))
+    benchmark(f"import_from_{_extension}")(_import(_extension))
+
+
+@benchmark("export_all_to_txt")
+def _export_all(work):
+    path = work.workdir / f"export_all_{work.size}.txt"
+    return lambda: work.system.export_all_to_txt(path)
+
+
+@benchmark("import_all_from_txt")
+def _import_all(work):
+    path = work.exported_all()
+    system = AddressBookSystem()
+    return lambda: system.import_all_from_txt(path)
+
+
+def import_time(module):
+    """
+    Imports a module in a fresh interpreter and returns the time it took, as
+    reported by `python -X importtime`, including the modules it imports.
+
+    Args:
+        module (str): The module to import, from this directory.
+
+    Returns:
+        float: The cumulative import time in seconds.
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               capture_output=True, text=True, check=True, cwd=Path(__file__).parent)
+    for line in completed.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", with the
+        # package name indented by its nesting depth.
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if name.strip() == module and not name.startswith("  "):
+            return int(cumulative) / 1e6
+    raise ValueError(f"No import time reported for '{module}'.")
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, names=None, repeat=3, log=None):
+    """
+    Runs benchmarks at each size.
+
+    Args:
+        sizes (iterable): The numbers of contacts to benchmark with.
+        names (iterable, optional): The benchmarks to run. Defaults to all.
+        repeat (int): The number of timed runs; the fastest is kept.
+        log (file object, optional): Receives a line per result.
+
+    Returns:
+        dict: The results, with "meta" describing the environment and
+        "results" mapping "name[size]" to {"name", "size", "seconds"}. Startup
+        benchmarks are keyed by name alone, with a size of None.
+
+    Raises:
+        ValueError: If a benchmark name is unknown.
+    """
+    names = list(names or [*BENCHMARKS, *STARTUP_BENCHMARKS])
+    unknown = [name for name in names if name not in BENCHMARKS and name not in STARTUP_BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmark(s): {', '.join(unknown)}.")
+    results = {}
+    for name in names:
+        if name in STARTUP_BENCHMARKS:
+            best = min(import_time(STARTUP_BENCHMARKS[name]) for _ in range(repeat))
+            results[name] = {"name": name, "size": None, "seconds": best}
+            if log is not None:
+                print(f"{name:<24} {'startup':>9} {best * 1000:12.2f} ms", file=log)
+    names = [name for name in names if name in BENCHMARKS]
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes if names else ():
+            work = _Workload(size, workdir)
+            for name in names:
+                best = None
+                for _ in range(repeat):
+                    with redirect_stdout(io.StringIO()):
+                        run = BENCHMARKS[name](work)
+                        start = time.perf_counter()
+                        run()
+                        elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                results[f"{name}[{size}]"] = {"name": name, "size": size, "seconds": best}
+                if log is not None:
+                    print(f"{name:<24} {size:>9,} {best * 1000:12.2f} ms", file=log)
+    meta = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "repeat": repeat,
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare_results(baseline, current, threshold=0.2, min_difference=MIN_DIFFERENCE):
+    """
+    Finds benchmarks that got slower than the baseline by more than `threshold`.
+
+    Only benchmarks present in both results are compared, and slowdowns of
+    less than `min_difference` seconds are ignored as timer noise.
+
+    Args:
+        baseline (dict): Results from `run_benchmarks`, e.g. of the previous revision.
+        current (dict): Results from `run_benchmarks`.
+        threshold (float): The accepted slowdown, as a fraction (0.2 = 20%).
+        min_difference (float): The smallest slowdown in seconds that counts.
+
+    Returns:
+        list: (key, baseline_seconds, current_seconds) for each regression.
+    """
+    regressions = []
+    for key, result in current["results"].items():
+        before = baseline["results"].get(key)
+        if (before and result["seconds"] > before["seconds"] * (1 + threshold)
+                and result["seconds"] - before["seconds"] >= min_difference):
+            regressions.append((key, before["seconds"], result["seconds"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Address Book System.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="numbers of contacts to benchmark with")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark")
+    parser.add_argument("--output", help="file to write the results to, as JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown flagged as a regression (default: 0.2 = 20%%)")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join([*BENCHMARKS, *STARTUP_BENCHMARKS]))
+        return 0
+    results = run_benchmarks(args.sizes, args.only, args.repeat, log=sys.stdout)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare_results(baseline, results, args.threshold)
+        for key, before, after in regressions:
+            print(f"REGRESSION {key}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms "
+                  f"({after / before - 1:+.0%})")
+        if regressions:
+            return 1
+        print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
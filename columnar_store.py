@@ -0,0 +1,505 @@
+"""
+columnar_store.py
+
+A compact, column-oriented address book for very large contact lists.
+
+Instead of one pydantic Contact per entry, a ColumnarAddressBook keeps each
+field in its own column: low-cardinality fields (names, city, state, ZIP code)
+are dictionary-encoded into arrays of integer codes, and the remaining fields
+are packed as UTF-8 bytes into a single buffer. Contact objects are only built
+when a contact is read.
+
+Classes:
+- ColumnarAddressBook: An AddressBook stored as columns.
+"""
+
+from array import array
+from collections import defaultdict
+from collections.abc import Sequence
+
+from address_book_system import SORT_KEYS, AddressBook, Contact, _found, _normalize
+from metrics import instrumented
+
+DICTIONARY_FIELDS = ("first_name", "last_name", "city", "state", "zip_code")
+BLOB_FIELDS = ("address", "phone_number", "email")
+
+
+class _DictionaryColumn:
+    """
+    A column of strings stored as integer codes into a table of distinct values.
+
+    Attributes:
+        values (list): The distinct values, indexed by code.
+        codes (array): The code of each row.
+        counts (list): The number of rows using each code.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.codes = array("I")
+        self.counts = []
+        self._code_of = {}
+        self._folded = defaultdict(set)
+
+    def encode(self, value):
+        """
+        Returns the code of `value`, adding it to the value table if needed.
+        """
+        code = self._code_of.get(value)
+        if code is None:
+            code = len(self.values)
+            self._code_of[value] = code
+            self.values.append(value)
+            self.counts.append(0)
+            self._folded[_normalize(value)].add(code)
+        return code
+
+    def codes_matching(self, value):
+        """
+        Returns:
+            set: The codes of every value equal to `value` case-insensitively.
+        """
+        return self._folded.get(_normalize(value), set())
+
+    def get(self, row):
+        return self.values[self.codes[row]]
+
+    def append(self, value):
+        code = self.encode(value)
+        self.codes.append(code)
+        self.counts[code] += 1
+
+    def set(self, row, value):
+        code = self.encode(value)
+        self.counts[self.codes[row]] -= 1
+        self.codes[row] = code
+        self.counts[code] += 1
+
+    def discard(self, row):
+        """
+        Stops counting a deleted row's value. The row itself is dropped by
+        the next `compact`.
+        """
+        self.counts[self.codes[row]] -= 1
+
+    def compact(self, keep):
+        """
+        Keeps only the given rows, in order.
+
+        Args:
+            keep (list): The row numbers to keep, ascending.
+        """
+        codes = self.codes
+        self.codes = array("I", [codes[row] for row in keep])
+
+
+class _BlobColumn:
+    """
+    A column of mostly distinct strings packed as UTF-8 into one buffer.
+
+    Space freed by edits is reclaimed once it exceeds half of the buffer;
+    space of deleted rows is reclaimed by `compact`.
+
+    Attributes:
+        data (bytearray): The encoded values.
+        starts (array): The offset of each row's value in `data`.
+        lengths (array): The encoded length of each row's value.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+        self.starts = array("Q")
+        self.lengths = array("I")
+        self._garbage = 0
+
+    def _store(self, value):
+        encoded = value.encode()
+        start = len(self.data)
+        self.data += encoded
+        return start, len(encoded)
+
+    def get(self, row):
+        start = self.starts[row]
+        return self.data[start:start + self.lengths[row]].decode()
+
+    def append(self, value):
+        start, length = self._store(value)
+        self.starts.append(start)
+        self.lengths.append(length)
+
+    def set(self, row, value):
+        self._garbage += self.lengths[row]
+        self.starts[row], self.lengths[row] = self._store(value)
+        self._maybe_compact()
+
+    def discard(self, row):
+        """
+        Does nothing: a deleted row's value is reclaimed by the next `compact`.
+        """
+
+    def compact(self, keep=None):
+        """
+        Keeps only the given rows, in order, and repacks their values.
+
+        Args:
+            keep (list, optional): The row numbers to keep, ascending; every
+                row if None.
+        """
+        if keep is None:
+            keep = range(len(self.starts))
+        data = bytearray()
+        starts, lengths = array("Q"), array("I")
+        for row in keep:
+            start, length = self.starts[row], self.lengths[row]
+            starts.append(len(data))
+            lengths.append(length)
+            data += self.data[start:start + length]
+        self.data, self.starts, self.lengths = data, starts, lengths
+        self._garbage = 0
+
+    def _maybe_compact(self):
+        if self._garbage * 2 > len(self.data):
+            self.compact()
+
+
+class _ColumnarContacts(Sequence):
+    """
+    A read-only sequence view of the contacts of a ColumnarAddressBook, either
+    in storage order or in the order of a list of row numbers.
+
+    Each access builds a new Contact; assigning to its fields does not change
+    the book. Use `edit_contact_by_name` instead.
+    """
+
+    def __init__(self, book, rows=None):
+        self._book = book
+        self._rows = rows
+
+    def __len__(self):
+        return self._book._size() if self._rows is None else len(self._rows)
+
+    def _row(self, i):
+        if self._rows is None:
+            return self._book._live_row(i)
+        return self._rows[i]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._book._contact_at(self._row(j)) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("contact index out of range")
+        return self._book._contact_at(self._row(i))
+
+    def __iter__(self):
+        rows = self._book._live_rows() if self._rows is None else self._rows
+        for row in rows:
+            yield self._book._contact_at(row)
+
+
+class ColumnarAddressBook(AddressBook):
+    """
+    An AddressBook that stores its contacts column by column.
+
+    It supports the same operations as AddressBook, including file import and
+    export, and keeps contacts in insertion order. `contacts` is a read-only
+    view whose Contact objects are built on access. Deleted rows are marked
+    dead and dropped from every column in one pass once they make up half of
+    the rows, or at the end of a bulk delete. Searches and counts by city, state and ZIP code are answered from
+    the columns, so an AddressBookSystem built with this book type does not
+    keep its own indexes.
+    """
+
+    indexed_by_system = False
+
+    def __init__(self, name=None):
+        """
+        Initializes an empty columnar address book.
+
+        Args:
+            name (str, optional): The name of the address book within its system.
+        """
+        self.name = name
+        self.observers = []
+        self.columns = {field: _DictionaryColumn() for field in DICTIONARY_FIELDS}
+        self.columns.update({field: _BlobColumn() for field in BLOB_FIELDS})
+        self._contacts = _ColumnarContacts(self)
+        self._folded_names = {}
+        self._name_index = {}
+        self._sorted = {}
+        self._dead = set()
+        self._live = None
+
+    @property
+    def contacts(self):
+        return self._contacts
+
+    def _size(self):
+        """
+        Returns:
+            int: The number of stored contacts.
+        """
+        return len(self.columns["first_name"].codes) - len(self._dead)
+
+    def _live_rows(self):
+        """
+        Returns:
+            iterable: The row numbers of the stored contacts, in insertion order.
+        """
+        rows = range(len(self.columns["first_name"].codes))
+        if not self._dead:
+            return rows
+        if self._live is None:
+            dead = self._dead
+            self._live = array("I", [row for row in rows if row not in dead])
+        return self._live
+
+    def _live_row(self, i):
+        """
+        Returns the row number of the i-th stored contact.
+        """
+        return self._live_rows()[i]
+
+    def _compact(self):
+        """
+        Drops every dead row from all columns in a single pass, and renumbers
+        the name index to match.
+        """
+        keep = self._live_rows()
+        for column in self.columns.values():
+            column.compact(keep)
+        new_row = {row: i for i, row in enumerate(keep)}
+        self._name_index = {key: new_row[row] for key, row in self._name_index.items()}
+        self._dead.clear()
+        self._live = None
+        self._sorted.clear()
+
+    def _contact_at(self, row):
+        """
+        Builds the Contact stored at a row. Stored values were validated on
+        insert, so the contact is constructed without validating it again.
+        """
+        return Contact.model_construct(**{field: column.get(row) for field, column in self.columns.items()})
+
+    def _row_key(self, first_name, last_name):
+        """
+        Returns the integer name-index key of a name, or None if either part
+        has never been stored.
+        """
+        first = self._folded_names.get(_normalize(first_name))
+        last = self._folded_names.get(_normalize(last_name))
+        if first is None or last is None:
+            return None
+        return first << 32 | last
+
+    def _new_row_key(self, first_name, last_name):
+        """
+        Returns the integer name-index key of a name, registering its parts.
+        """
+        for part in (first_name, last_name):
+            self._folded_names.setdefault(_normalize(part), len(self._folded_names))
+        return self._row_key(first_name, last_name)
+
+    # Indexing
+    def _insert(self, contact):
+        key = self._new_row_key(contact.first_name, contact.last_name)
+        if key in self._name_index:
+            return False
+        self._name_index[key] = len(self.columns["first_name"].codes)
+        self._live = None
+        for field, column in self.columns.items():
+            column.append(getattr(contact, field))
+        self._sorted.clear()
+        for observer in self.observers:
+            observer.contact_added(self.name, contact)
+        return True
+
+    def _insert_many(self, contacts):
+        return sum(self._insert(contact) for contact in contacts)
+
+    def _discard(self, row):
+        """
+        Marks a row dead, keeping the rows after it in place.
+        """
+        for column in self.columns.values():
+            column.discard(row)
+        self._dead.add(row)
+        self._live = None
+        self._sorted.clear()
+
+    def _remove(self, key):
+        row = self._name_index.pop(key)
+        removed = self._contact_at(row)
+        self._discard(row)
+        if len(self._dead) * 2 > len(self.columns["first_name"].codes):
+            self._compact()
+        for observer in self.observers:
+            observer.contact_removed(self.name, removed)
+        return removed
+
+    def _find(self, first_name, last_name):
+        row = self._name_index.get(self._row_key(first_name, last_name))
+        if row is None:
+            return None
+        return self._contact_at(row)
+
+    @instrumented(hit=_found)
+    def edit_contact_by_name(self, first_name, last_name, updates: dict):
+        key = self._row_key(first_name, last_name)
+        row = self._name_index.get(key)
+        if row is None:
+            return None
+        changes = self._validate_updates(updates)
+
+        new_key = self._new_row_key(changes.get("first_name", self.columns["first_name"].get(row)),
+                                    changes.get("last_name", self.columns["last_name"].get(row)))
+        if new_key != key and new_key in self._name_index:
+            raise ValueError("A contact with this name already exists.")
+
+        old_values = {field: self.columns[field].get(row) for field in changes}
+        for field, new_value in changes.items():
+            self.columns[field].set(row, new_value)
+        for sort_key in list(self._sorted):
+            if not changes.keys().isdisjoint(SORT_KEYS[sort_key][0]):
+                del self._sorted[sort_key]
+        if new_key != key:
+            del self._name_index[key]
+            self._name_index[new_key] = row
+        contact = self._contact_at(row)
+        if changes:
+            for observer in self.observers:
+                observer.contact_updated(self.name, contact, old_values)
+        return contact
+
+    @instrumented(hit=_found)
+    def delete_contact_by_name(self, first_name, last_name):
+        key = self._row_key(first_name, last_name)
+        if key not in self._name_index:
+            return None
+        return self._remove(key)
+
+    # Bulk changes
+    def _bulk_update(self, match, changes, candidates=None):
+        updated = 0
+        for contact in self._select(match, candidates):
+            row = self._name_index[self._row_key(contact.first_name, contact.last_name)]
+            old_values = {field: getattr(contact, field) for field, new_value in changes.items()
+                          if getattr(contact, field) != new_value}
+            if not old_values:
+                continue
+            for field in old_values:
+                self.columns[field].set(row, changes[field])
+            for observer in self.observers:
+                observer.contact_updated(self.name, self._contact_at(row), old_values)
+            updated += 1
+        if updated:
+            for sort_key in list(self._sorted):
+                if not changes.keys().isdisjoint(SORT_KEYS[sort_key][0]):
+                    del self._sorted[sort_key]
+        return updated
+
+    def _bulk_delete(self, match, candidates=None):
+        removed = self._select(match, candidates)
+        if not removed:
+            return 0
+        for contact in removed:
+            self._discard(self._name_index.pop(self._row_key(contact.first_name, contact.last_name)))
+        self._compact()
+        for contact in removed:
+            for observer in self.observers:
+                observer.contact_removed(self.name, contact)
+        return len(removed)
+
+    # Sorting
+    def _sorted_rows(self, *fields):
+        """
+        Sorts row numbers by one or more dictionary-encoded fields, comparing
+        values case-insensitively. Each distinct value is ranked once, so rows
+        are compared by small integers.
+        """
+        rankings = []
+        for field in fields:
+            column = self.columns[field]
+            order = sorted(range(len(column.values)), key=lambda code: column.values[code].lower())
+            ranks = array("I", bytes(4 * len(order)))
+            for rank, code in enumerate(order):
+                ranks[code] = rank
+            rankings.append((column.codes, ranks))
+        rows = self._live_rows()
+        if len(rankings) == 1:
+            (codes, ranks), = rankings
+            return sorted(rows, key=lambda row: ranks[codes[row]])
+        return sorted(rows, key=lambda row: tuple(ranks[codes[row]] for codes, ranks in rankings))
+
+    def _sort_order(self, sort_key):
+        """
+        Returns a lazy view of the contacts in SORT_KEYS order. The sorted row
+        numbers are cached until the book changes.
+        """
+        rows = self._sorted.get(sort_key)
+        if rows is None:
+            if sort_key not in SORT_KEYS:
+                raise ValueError(f"Cannot sort by '{sort_key}'. Choose one of {', '.join(SORT_KEYS)}.")
+            rows = self._sorted[sort_key] = array("I", self._sorted_rows(*SORT_KEYS[sort_key][0]))
+        return _ColumnarContacts(self, rows)
+
+    # Searching and counting
+    def search_by(self, field, value):
+        """
+        Finds contacts whose dictionary-encoded `field` matches `value` case-insensitively.
+
+        Args:
+            field (str): One of the dictionary-encoded fields.
+            value (str): The value to look up.
+
+        Returns:
+            list: A list of tuples (book_name, contact) for matches.
+        """
+        column = self.columns[field]
+        codes = column.codes_matching(value)
+        if not codes:
+            return []
+        return [(self.name, self._contact_at(row)) for row, code in enumerate(column.codes)
+                if code in codes and row not in self._dead]
+
+    def grouped_by(self, field):
+        """
+        Groups the contacts by their exact value of a dictionary-encoded field.
+
+        Returns:
+            dict: A dictionary mapping each value to a list of (book_name, contact) tuples.
+        """
+        column = self.columns[field]
+        groups = defaultdict(list)
+        for row in self._live_rows():
+            groups[column.values[column.codes[row]]].append((self.name, self._contact_at(row)))
+        return groups
+
+    def count_by(self, field):
+        """
+        Counts the contacts per exact value of a dictionary-encoded field.
+
+        Returns:
+            dict: A dictionary mapping each value to its contact count.
+        """
+        column = self.columns[field]
+        return defaultdict(int, {column.values[code]: count for code, count in enumerate(column.counts) if count})
+
+    def search_by_city(self, city):
+        return self.search_by("city", city)
+
+    def search_by_state(self, state):
+        return self.search_by("state", state)
+
+    def search_by_zip(self, zip_code):
+        return self.search_by("zip_code", zip_code)
+
+    def count_by_city(self):
+        return self.count_by("city")
+
+    def count_by_state(self):
+        return self.count_by("state")
+
+    def count_by_zip(self):
+        return self.count_by("zip_code")
@@ -0,0 +1,359 @@
+"""
+concurrency.py
+
+A thread-safe Address Book System, for applications that search from many
+threads while imports and edits run.
+
+Each ThreadSafeAddressBook has its own reader-writer lock: any number of
+threads may read a book at once, while a change to it waits for the readers
+to finish and excludes everyone else. The system-wide indexes have one more
+reader-writer lock, taken by the system's searches and counts and by the
+observers that keep the indexes up to date.
+
+Locks are always taken book first, then system, so they cannot deadlock.
+Contacts returned by a search are the stored objects: an edit made after the
+search returns changes them in place.
+
+Classes:
+- RWLock: A reader-writer lock.
+- ThreadSafeAddressBook: An AddressBook guarded by an RWLock.
+- ThreadSafeAddressBookSystem: An AddressBookSystem of thread-safe books.
+"""
+
+import threading
+
+from address_book_system import PAGE_SIZE, AddressBook, AddressBookObserver, AddressBookSystem
+
+
+class _Guard:
+    """
+    A context manager calling `acquire` on entry and `release` on exit.
+    """
+
+    def __init__(self, acquire, release):
+        self._acquire = acquire
+        self._release = release
+
+    def __enter__(self):
+        self._acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._release()
+
+
+class RWLock:
+    """
+    A reader-writer lock that prefers writers.
+
+    Use `with lock.read:` or `with lock.write:`. Waiting writers block new
+    readers, so a steady stream of reads cannot starve an import. The thread
+    holding the write lock may take the read or write lock again. A thread
+    holding the read lock must not take either lock again, since a waiting
+    writer would block it.
+
+    Attributes:
+        read: Context manager holding the lock shared.
+        write: Context manager holding the lock exclusively.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+        self.read = _Guard(self.acquire_read, self.release_read)
+        self.write = _Guard(self.acquire_write, self.release_write)
+
+    def acquire_read(self):
+        with self._condition:
+            if self._writer == threading.get_ident():
+                self._write_depth += 1
+                return
+            while self._writer is not None or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._condition:
+            if self._writer == threading.get_ident():
+                self._write_depth -= 1
+                return
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self):
+        with self._condition:
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._condition.notify_all()
+
+
+class ThreadSafeAddressBook(AddressBook):
+    """
+    An AddressBook whose operations hold its reader-writer lock.
+
+    Imports take the write lock once per chunk of contacts, so searches can
+    run while a long import is in progress. `iter_sorted` returns the
+    requested page as an iterator over a copy taken under the lock.
+
+    Attributes:
+        lock (RWLock): The book's lock.
+    """
+
+    def __init__(self, name=None):
+        """
+        Initializes an empty address book and its lock.
+
+        Args:
+            name (str, optional): The name of the address book within its system.
+        """
+        super().__init__(name)
+        self.lock = RWLock()
+
+    # Writes
+    def _insert(self, contact):
+        with self.lock.write:
+            return super()._insert(contact)
+
+    def _insert_many(self, contacts):
+        with self.lock.write:
+            return super()._insert_many(contacts)
+
+    def _remove(self, key):
+        with self.lock.write:
+            return super()._remove(key)
+
+    def edit_contact_by_name(self, first_name, last_name, updates: dict):
+        with self.lock.write:
+            return super().edit_contact_by_name(first_name, last_name, updates)
+
+    def delete_contact_by_name(self, first_name, last_name):
+        with self.lock.write:
+            return super().delete_contact_by_name(first_name, last_name)
+
+    def _bulk_update(self, match, changes, candidates=None):
+        with self.lock.write:
+            return super()._bulk_update(match, changes, candidates)
+
+    def _bulk_delete(self, match, candidates=None):
+        with self.lock.write:
+            return super()._bulk_delete(match, candidates)
+
+    # Reads
+    def _find(self, first_name, last_name):
+        with self.lock.read:
+            return super()._find(first_name, last_name)
+
+    def list_contacts(self):
+        with self.lock.read:
+            return super().list_contacts()
+
+    # Readers may fill a missing sort order concurrently; they compute the same
+    # order, so the last assignment wins harmlessly.
+    def sort_by_name(self):
+        with self.lock.read:
+            return super().sort_by_name()
+
+    def sort_by_city(self):
+        with self.lock.read:
+            return super().sort_by_city()
+
+    def sort_by_state(self):
+        with self.lock.read:
+            return super().sort_by_state()
+
+    def sort_by_zip(self):
+        with self.lock.read:
+            return super().sort_by_zip()
+
+    def list_page(self, sort_key=None, cursor=0, page_size=PAGE_SIZE):
+        with self.lock.read:
+            return super().list_page(sort_key, cursor, page_size)
+
+    def iter_sorted(self, sort_key, offset=0, limit=None):
+        with self.lock.read:
+            return iter(list(super().iter_sorted(sort_key, offset, limit)))
+
+    def export_to_txt(self, filename):
+        with self.lock.read:
+            return super().export_to_txt(filename)
+
+    def export_to_csv(self, filename):
+        with self.lock.read:
+            return super().export_to_csv(filename)
+
+    def export_to_json(self, filename):
+        with self.lock.read:
+            return super().export_to_json(filename)
+
+    def export_to_ndjson(self, filename, append=False):
+        with self.lock.read:
+            return super().export_to_ndjson(filename, append)
+
+
+class _LockedObserver(AddressBookObserver):
+    """
+    Forwards events to a system-wide observer while holding the system lock.
+    """
+
+    def __init__(self, observer, lock):
+        self.observer = observer
+        self.lock = lock
+
+    def book_added(self, book_name):
+        with self.lock.write:
+            self.observer.book_added(book_name)
+
+    def contact_added(self, book_name, contact):
+        with self.lock.write:
+            self.observer.contact_added(book_name, contact)
+
+    def contacts_added(self, book_name, contacts):
+        with self.lock.write:
+            self.observer.contacts_added(book_name, contacts)
+
+    def contact_removed(self, book_name, contact):
+        with self.lock.write:
+            self.observer.contact_removed(book_name, contact)
+
+    def contact_updated(self, book_name, contact, old_values):
+        with self.lock.write:
+            self.observer.contact_updated(book_name, contact, old_values)
+
+
+class ThreadSafeAddressBookSystem(AddressBookSystem):
+    """
+    An in-memory AddressBookSystem of ThreadSafeAddressBook objects.
+
+    Observers added with `add_observer`, including the system's own indexes,
+    are called under the system lock, and the system's searches, counts and
+    groupings read the indexes under it.
+
+    Attributes:
+        lock (RWLock): The lock guarding the book mapping and the system-wide
+            indexes and observers.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty system whose books are ThreadSafeAddressBook objects.
+        """
+        self.lock = RWLock()
+        super().__init__(book_factory=ThreadSafeAddressBook)
+
+    def add_observer(self, observer):
+        with self.lock.write:
+            super().add_observer(_LockedObserver(observer, self.lock))
+
+    def add_address_book(self, name):
+        with self.lock.write:
+            return super().add_address_book(name)
+
+    def _with_books_frozen(self, func, exclusive=False):
+        """
+        Calls `func` while every book's read lock and the system lock are held,
+        so that no contact changes while it runs.
+
+        Book locks are taken before the system lock, as writers take them. If a
+        book is added while they are being taken, they are taken again.
+
+        Args:
+            func (callable): Called without arguments.
+            exclusive (bool): Hold the system lock for writing instead of
+                reading, e.g. to register an observer.
+
+        Returns:
+            The result of `func`.
+        """
+        while True:
+            with self.lock.read:
+                books = list(self.books.values())
+            for book in books:
+                book.lock.acquire_read()
+            try:
+                with self.lock.write if exclusive else self.lock.read:
+                    # Books are never removed, so equal sizes mean no book was added.
+                    if len(self.books) == len(books):
+                        return func()
+            finally:
+                for book in reversed(books):
+                    book.lock.release_read()
+
+    def _search(self, field, value):
+        with self.lock.read:
+            return super()._search(field, value)
+
+    def _grouped(self, field):
+        with self.lock.read:
+            return super()._grouped(field)
+
+    def _count(self, field):
+        with self.lock.read:
+            return super()._count(field)
+
+    def _bucket_groups(self, index, key):
+        with self.lock.read:
+            return super()._bucket_groups(index, key)
+
+    def _bucket_keys(self, index, key):
+        with self.lock.read:
+            return super()._bucket_keys(index, key)
+
+    def _bucket_entries(self, index, key, entry_keys):
+        with self.lock.read:
+            return super()._bucket_entries(index, key, entry_keys)
+
+    def _index_count(self, field, key):
+        with self.lock.read:
+            return super()._index_count(field, key)
+
+    def _index_entries(self, field, match):
+        with self.lock.read:
+            return super()._index_entries(field, match)
+
+    # Scans read a copy of the entries taken with every book frozen, so that
+    # no writer changes a book's contact list while it is being iterated.
+    def _entry_count(self, book_names=None):
+        return self._with_books_frozen(
+            lambda: super(ThreadSafeAddressBookSystem, self)._entry_count(book_names))
+
+    def _iter_entries(self, book_names=None):
+        return iter(self._with_books_frozen(
+            lambda: list(super(ThreadSafeAddressBookSystem, self)._iter_entries(book_names))))
+
+    def _build_search_index(self):
+        if self._search_index is None:
+            from search_index import SearchIndex
+            self._search_index = SearchIndex.from_system(self)
+            self.add_observer(self._search_index)
+
+    def suggest(self, text, field="name", limit=10):
+        if self._search_index is None:
+            # Build the index with every book frozen, so that no change is
+            # missed between reading the contacts and registering the index.
+            self._with_books_frozen(self._build_search_index, exclusive=True)
+        with self.lock.read:
+            return super().suggest(text, field, limit)
+
+    def analytics(self):
+        return self._with_books_frozen(super().analytics, exclusive=True)
+
+    def export_all_to_txt(self, filename):
+        return self._with_books_frozen(lambda: super(ThreadSafeAddressBookSystem, self).export_all_to_txt(filename))
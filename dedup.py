@@ -0,0 +1,262 @@
+"""
+dedup.py
+
+System-wide detection and merging of duplicate contacts.
+
+An AddressBook only rejects a contact whose name is already in that book. The
+dedup job looks across every book of an AddressBookSystem and treats two
+contacts as the same person if any of these hold:
+- they have the same name, case-insensitively,
+- they have the same phone number, ignoring spaces and the country code,
+- they have the same email address, case-insensitively,
+- they share a ZIP code and a phonetic (Soundex) last name, and their full
+  names are within a small edit distance of each other.
+
+Contacts are never compared all against all. Exact matches are found through
+dictionaries keyed by name, phone and email. Fuzzy matches are only looked
+for within a block of contacts sharing ZIP code and Soundex code; each block
+is sorted by name and every contact is compared with the next few, so the
+work grows linearly with the number of contacts. Matches are grouped
+transitively with a union-find structure.
+
+Each group becomes a MergePlan, which keeps the first contact of the group in
+book order and deletes the others. Before that, any field on which most of
+the group disagree with the kept contact is updated to the majority value.
+
+Classes:
+- MergePlan: The merge of one group of duplicates.
+
+Functions:
+- soundex: The Soundex code of a name.
+- find_duplicates: Build merge plans for a system.
+- apply_merge_plans: Apply merge plans to a system.
+"""
+
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from address_book_system import _gc_paused, _name_key
+
+# The minimum similarity, from 0 to 1, for two names to count as the same.
+NAME_SIMILARITY = 0.85
+
+# The number of following contacts, in name order within a block, that each
+# contact is compared with.
+WINDOW = 8
+
+# Fields a merge may update on the kept contact. Names identify the contact
+# and are never changed.
+MERGED_FIELDS = ("address", "city", "state", "zip_code", "phone_number", "email")
+
+# Match reasons.
+SAME_NAME = "name"
+SAME_PHONE = "phone"
+SAME_EMAIL = "email"
+SIMILAR_NAME = "similar_name"
+
+_SOUNDEX_CODES = {letter: str(digit) for digit, letters in enumerate(
+    ("AEIOUYHW", "BFPV", "CGJKQSXZ", "DT", "L", "MN", "R")) for letter in letters}
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+@lru_cache(maxsize=1 << 16)
+def soundex(name):
+    """
+    Returns the four-character Soundex code of a name, e.g. "R163" for
+    "Robert" and "Rupert". Non-letters are ignored.
+
+    Args:
+        name (str): The name.
+
+    Returns:
+        str: The code, or "" if the name has no ASCII letters.
+    """
+    letters = [c for c in name.upper() if c in _SOUNDEX_CODES]
+    if not letters:
+        return ""
+    code = letters[0]
+    previous = _SOUNDEX_CODES[letters[0]]
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES[letter]
+        if digit != "0" and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if letter not in "HW":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def _phone_key(phone_number):
+    return _NON_DIGITS.sub("", phone_number)[-10:]
+
+
+def _full_name(contact):
+    return f"{contact.first_name} {contact.last_name}".casefold()
+
+
+def _similar(a, b, threshold):
+    """
+    Tells whether the edit distance between two strings is small enough for
+    their similarity, 1 - distance / longer length, to reach `threshold`.
+    Stops as soon as the distance is known to be too large.
+    """
+    longest = max(len(a), len(b))
+    max_distance = int((1 - threshold) * longest + 1e-9)
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    row = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        previous, row[0] = row[0], i
+        best = i
+        for j, other in enumerate(b, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (char != other))
+            best = min(best, row[j])
+        if best > max_distance:
+            return False
+    return row[-1] <= max_distance
+
+
+@dataclass
+class MergePlan:
+    """
+    The merge of one group of contacts found to be the same person.
+
+    Attributes:
+        keep (tuple): (book_name, contact) of the contact that is kept.
+        duplicates (list): (book_name, contact) of the contacts deleted.
+        reasons (set): How the contacts were matched: "name", "phone",
+            "email" and/or "similar_name".
+        updates (dict): Field values the kept contact takes from the group.
+    """
+    keep: tuple
+    duplicates: list
+    reasons: set = field(default_factory=set)
+    updates: dict = field(default_factory=dict)
+
+
+class _UnionFind:
+    """
+    Groups the integers 0..n-1. The root of each group is its smallest member.
+    """
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.reasons = {}
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j, reason):
+        i, j = self.find(i), self.find(j)
+        if i == j:
+            self.reasons[i].add(reason)
+            return
+        if j < i:
+            i, j = j, i
+        self.parent[j] = i
+        reasons = self.reasons.setdefault(i, set())
+        reasons.add(reason)
+        reasons.update(self.reasons.pop(j, ()))
+
+
+def _majority_updates(keep, group):
+    """
+    Returns the values that most of a group share but the kept contact lacks.
+    """
+    updates = {}
+    for field_name in MERGED_FIELDS:
+        value, count = Counter(getattr(contact, field_name) for _, contact in group).most_common(1)[0]
+        if value != getattr(keep, field_name) and count * 2 > len(group):
+            updates[field_name] = value
+    return updates
+
+
+def find_duplicates(system, threshold=NAME_SIMILARITY, window=WINDOW):
+    """
+    Finds groups of duplicate contacts across all books of a system.
+
+    Args:
+        system (AddressBookSystem): The system to search.
+        threshold (float): The minimum name similarity, from 0 to 1, of a
+            fuzzy match.
+        window (int): The number of neighbours, in name order within a block,
+            each contact is compared with.
+
+    Returns:
+        list: One MergePlan per group of duplicates, in book order.
+    """
+    with _gc_paused():
+        return _plans(system, threshold, window)
+
+
+def _plans(system, threshold, window):
+    """
+    Groups the contacts of a system and builds a MergePlan per group of two
+    or more; see find_duplicates.
+    """
+    entries = [(book_name, contact) for book_name, book in system.books.items() for contact in book.contacts]
+    groups = _UnionFind(len(entries))
+    seen = ({}, {}, {})
+    blocks = defaultdict(list)
+    for i, (_, contact) in enumerate(entries):
+        keys = (_name_key(contact.first_name, contact.last_name), _phone_key(contact.phone_number),
+                contact.email.casefold())
+        for key, first_seen, reason in zip(keys, seen, (SAME_NAME, SAME_PHONE, SAME_EMAIL)):
+            first = first_seen.setdefault(key, i)
+            if first != i:
+                groups.union(first, i, reason)
+        blocks[contact.zip_code, soundex(contact.last_name)].append(i)
+
+    for block in blocks.values():
+        if len(block) < 2:
+            continue
+        names = sorted((_full_name(entries[i][1]), i) for i in block)
+        for position, (name, i) in enumerate(names):
+            for other, j in names[position + 1:position + 1 + window]:
+                if groups.find(i) != groups.find(j) and _similar(name, other, threshold):
+                    groups.union(i, j, SIMILAR_NAME)
+
+    # Only groups that had a union have reasons; their roots are their first
+    # members, so sorting the roots keeps the plans in book order.
+    members = {root: [] for root in sorted(groups.reasons)}
+    for i, entry in enumerate(entries):
+        group = members.get(groups.find(i))
+        if group is not None:
+            group.append(entry)
+    return [MergePlan(group[0], group[1:], groups.reasons[root], _majority_updates(group[0][1], group))
+            for root, group in members.items()]
+
+
+def apply_merge_plans(system, plans):
+    """
+    Applies merge plans: deletes the duplicates with one bulk delete per
+    book, then updates each kept contact. Contacts that were deleted or
+    renamed since the plans were made are skipped.
+
+    Args:
+        system (AddressBookSystem): The system the plans were made for.
+        plans (list): The MergePlan objects, e.g. from find_duplicates.
+
+    Returns:
+        int: The number of contacts deleted.
+    """
+    doomed = defaultdict(set)
+    for plan in plans:
+        for book_name, contact in plan.duplicates:
+            doomed[book_name].add(_name_key(contact.first_name, contact.last_name))
+    deleted = sum(system.books[book_name].bulk_delete(
+        lambda contact, keys=keys: _name_key(contact.first_name, contact.last_name) in keys)
+        for book_name, keys in doomed.items())
+    for plan in plans:
+        if plan.updates:
+            book_name, contact = plan.keep
+            system.books[book_name].edit_contact_by_name(contact.first_name, contact.last_name, plan.updates)
+    return deleted
@@ -5,15 +5,41 @@ This is the entry point for the Address Book System.
 It provides a command-line interface for managing multiple address books,
 adding and editing contacts, and handling file operations.
 
+Run without arguments, it shows the interactive menu. Run with a command, it
+applies that command to the books stored in an SQLite database and exits,
+reading contacts from stdin and writing JSON to stdout, e.g.:
+
+    python main.py --db books.db add Work < contacts.ndjson
+    python main.py --db books.db search city Pune
+    python main.py --db books.db count state
+    python main.py --db books.db dedupe --apply
+
+Commands:
+- add BOOK: Add NDJSON (or, with --format csv, CSV) contacts from stdin.
+- import BOOK FILE: Import a .txt, .csv, .json or .ndjson file.
+- export BOOK: Write a book's contacts to stdout as NDJSON or CSV.
+- search FIELD VALUE: Write matching contacts as NDJSON.
+- count FIELD: Write the number of contacts per value as a JSON object.
+- dedupe: Write the duplicate groups found as NDJSON; --apply merges them.
+
 Functions:
 - get_contact_from_console(): Prompt user to input a contact's details.
 - get_fields_to_update(): Prompt user for fields they wish to update.
 - select_address_book(): Let the user select or create an address book.
+- page_through(): Show pages of results one screen at a time.
+- show_grouped(): Page through contacts grouped by a field.
+- run_batch(): Run one command from the command line.
 """
 
-from address_book_system import AddressBookSystem, AddressBookMain, Contact
+import sys
+
+from address_book_system import (IMPORT_CHUNK_SIZE, SEARCH_FIELDS, AddressBookSystem, AddressBookMain, Contact,
+                                 entry_dict, iter_ndjson, json_dumps, write_ndjson)
 from pydantic import ValidationError
 
+# The database used by commands when --db is not given.
+DEFAULT_DB = "address_books.db"
+
 def get_contact_from_console():
     """
     Prompts the user to enter all details of a contact.
@@ -89,10 +115,185 @@ def select_address_book(system):
                 print(str(ve))
     return book
 
+def page_through(pages, render):
+    """
+    Shows pages of results one at a time, asking before each further page.
+
+    Args:
+        pages (iterable): Lists of items, e.g. from AddressBook.iter_pages.
+        render (callable): Prints one item.
+
+    Returns:
+        bool: True if at least one item was shown.
+    """
+    shown = False
+    for page in pages:
+        if shown and input("\nPress Enter for the next page, or q to stop: ").strip().lower() == "q":
+            break
+        for item in page:
+            render(item)
+        shown = True
+    return shown
+
+def show_grouped(pages, label):
+    """
+    Pages through (value, book_name, contact) entries, printing a heading
+    whenever the value changes.
+
+    Args:
+        pages (iterable): Pages from AddressBookSystem.iter_grouped_pages.
+        label (str): The name of the grouping field, e.g. "City".
+
+    Returns:
+        bool: True if at least one contact was shown.
+    """
+    current = None
+
+    def render(entry):
+        nonlocal current
+        value, book_name, contact = entry
+        if value != current:
+            print(f"\n{label}: {value}")
+            current = value
+        print(f"[Book: {book_name}] {contact}")
+
+    return page_through(pages, render)
+
+def _book(system, name, create=False):
+    book = system.get_address_book(name)
+    if book is None:
+        if not create:
+            raise ValueError(f"Address Book '{name}' not found.")
+        system.add_address_book(name)
+        book = system.get_address_book(name)
+    return book
+
+def _add(system, args, out):
+    if args.format == "csv":
+        import csv
+        rows = csv.DictReader(sys.stdin)
+    else:
+        rows = iter_ndjson(sys.stdin)
+    report = _book(system, args.book, create=True).import_records(rows, "<stdin>", args.batch_size)
+    out.write(json_dumps(report.as_dict()) + "\n")
+
+def _import(system, args, out):
+    book = _book(system, args.book, create=True)
+    extension = args.file.rsplit(".", 1)[-1].lower()
+    if extension == "txt":
+        report = book.import_from_txt(args.file, args.batch_size)
+    elif extension == "csv":
+        report = book.import_from_csv(args.file, args.batch_size, trusted=args.trusted)
+    elif extension == "json":
+        report = book.import_from_json(args.file, trusted=args.trusted)
+    else:
+        report = book.import_from_ndjson(args.file, args.batch_size, trusted=args.trusted)
+    if report is None:
+        raise ValueError(f"File '{args.file}' not found.")
+    out.write(json_dumps(report.as_dict()) + "\n")
+
+def _export(system, args, out):
+    book = _book(system, args.book)
+    if args.format == "csv":
+        import csv
+        writer = csv.writer(out)
+        fields = list(Contact.model_fields)
+        writer.writerow(fields)
+        writer.writerows([getattr(contact, field) for field in fields] for contact in book.contacts)
+    else:
+        write_ndjson(book.contacts, out)
+
+def _search(system, args, out):
+    for book_name, contact in system.search(args.field, args.value):
+        out.write(json_dumps(entry_dict(book_name, contact)) + "\n")
+
+def _count(system, args, out):
+    out.write(json_dumps(dict(system.count_by(args.field))) + "\n")
+
+def _dedupe(system, args, out):
+    from dedup import apply_merge_plans, find_duplicates
+    plans = find_duplicates(system)
+    for plan in plans:
+        out.write(json_dumps({
+            "keep": entry_dict(*plan.keep),
+            "duplicates": [entry_dict(*entry) for entry in plan.duplicates],
+            "reasons": sorted(plan.reasons),
+            "updates": plan.updates,
+        }) + "\n")
+    if args.apply:
+        print(f"Merged {len(plans)} group(s), deleting {apply_merge_plans(system, plans)} contact(s).")
+
+def run_batch(argv=None):
+    """
+    Runs one command against the address books stored in an SQLite database.
+
+    Contacts are validated and stored `--batch-size` at a time, so a single
+    invocation can add hundreds of thousands of contacts. Results are written
+    to stdout as JSON; messages and errors go to stderr.
+
+    Args:
+        argv (list, optional): The command-line arguments, without the program
+            name. Defaults to sys.argv[1:].
+
+    Returns:
+        int: The exit status: 0 on success, 1 if the command failed.
+    """
+    import argparse
+    from contextlib import redirect_stdout
+    from sqlite_storage import SQLiteStorage
+
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="Apply one command to the address books in a database. "
+                                    "Run without arguments for the interactive menu.")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"SQLite database of address books (default: {DEFAULT_DB})")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_CHUNK_SIZE,
+                        help="number of contacts validated and stored together")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("add", help="add contacts read from stdin to a book")
+    command.add_argument("book")
+    command.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    command.set_defaults(run=_add)
+    command = commands.add_parser("import", help="import a .txt, .csv, .json or .ndjson file into a book")
+    command.add_argument("book")
+    command.add_argument("file")
+    command.add_argument("--trusted", action="store_true", help="skip validation if the file matches its checksum")
+    command.set_defaults(run=_import)
+    command = commands.add_parser("export", help="write a book's contacts to stdout")
+    command.add_argument("book")
+    command.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    command.set_defaults(run=_export)
+    command = commands.add_parser("search", help="write the contacts of all books matching a value")
+    command.add_argument("field", choices=tuple(SEARCH_FIELDS))
+    command.add_argument("value")
+    command.set_defaults(run=_search)
+    command = commands.add_parser("count", help="count the contacts of all books per value of a field")
+    command.add_argument("field", choices=tuple(SEARCH_FIELDS))
+    command.set_defaults(run=_count)
+    command = commands.add_parser("dedupe", help="find duplicate contacts across all books")
+    command.add_argument("--apply", action="store_true", help="merge the duplicates found")
+    command.set_defaults(run=_dedupe)
+    args = parser.parse_args(argv)
+
+    out = sys.stdout
+    storage = SQLiteStorage(args.db, batch_size=args.batch_size)
+    try:
+        # Anything printed along the way is a message for the user, not output.
+        with redirect_stdout(sys.stderr):
+            args.run(AddressBookSystem(storage=storage), args, out)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        storage.close()
+    return 0
+
 if __name__ == "__main__":
     """
-    Initializes the address book system and displays the main menu.
+    Runs a command if one is given; otherwise initializes the address book
+    system and displays the main menu.
     """
+    if len(sys.argv) > 1:
+        sys.exit(run_batch())
     AddressBookMain()
     system = AddressBookSystem()
 
@@ -178,39 +379,27 @@ if __name__ == "__main__":
                         print("Contact not found.")
 
                 elif sub_choice == "4":
-                    contacts = book.list_contacts()
-                    if contacts:
-                        for c in contacts:
-                            print("\n" + c)
-                    else:
+                    if not page_through(book.iter_pages(), lambda c: print("\n" + str(c))):
                         print("No contacts found.")
 
                 elif sub_choice == "5":
-                    sorted_contacts = book.get_sorted_contacts()
-                    if not sorted_contacts:
+                    if not book.contacts:
                         print("No contacts to display.")
                     else:
                         print("\nSorted Contacts:")
-                        for contact in sorted_contacts:
-                            print("\n" + str(contact))
+                        page_through(book.iter_pages("name"), lambda c: print("\n" + str(c)))
 
                 elif sub_choice == "6":
-                    sorted_contacts = book.sort_by_city()
                     print("\nContacts Sorted by City:")
-                    for c in sorted_contacts:
-                        print("\n" + str(c))
+                    page_through(book.iter_pages("city"), lambda c: print("\n" + str(c)))
 
                 elif sub_choice == "7":
-                    sorted_contacts = book.sort_by_state()
                     print("\nContacts Sorted by State:")
-                    for c in sorted_contacts:
-                        print("\n" + str(c))
+                    page_through(book.iter_pages("state"), lambda c: print("\n" + str(c)))
 
                 elif sub_choice == "8":
-                    sorted_contacts = book.sort_by_zip()
                     print("\nContacts Sorted by Zip Code:")
-                    for c in sorted_contacts:
-                        print("\n" + str(c))
+                    page_through(book.iter_pages("zip"), lambda c: print("\n" + str(c)))
 
                 elif sub_choice == "9":
                     filename = input("Enter text filename to export (e.g., book.txt): ").strip()
@@ -252,45 +441,25 @@ if __name__ == "__main__":
 
         elif main_choice == "4":
             city = input("Enter city name to search: ").strip()
-            results = system.search_by_city(city)
-            if results:
-                print(f"\nFound contacts in city '{city}':")
-                for book_name, contact in results:
-                    print(f"\n[Book: {book_name}]")
-                    print(contact)
-            else:
+            print(f"\nContacts in city '{city}':")
+            if not page_through(system.iter_search_pages("city", city),
+                                lambda entry: print(f"\n[Book: {entry[0]}]\n{entry[1]}")):
                 print("No contacts found in this city.")
 
         elif main_choice == "5":
             state = input("Enter state name to search: ").strip()
-            results = system.search_by_state(state)
-            if results:
-                print(f"\nFound contacts in state '{state}':")
-                for book_name, contact in results:
-                    print(f"\n[Book: {book_name}]")
-                    print(contact)
-            else:
+            print(f"\nContacts in state '{state}':")
+            if not page_through(system.iter_search_pages("state", state),
+                                lambda entry: print(f"\n[Book: {entry[0]}]\n{entry[1]}")):
                 print("No contacts found in this state.")
 
         elif main_choice == "6":
-            grouped = system.view_all_grouped_by_city()
-            if not grouped:
+            if not show_grouped(system.iter_grouped_pages("city"), "City"):
                 print("No contacts found.")
-            else:
-                for city, entries in grouped.items():
-                    print(f"\nCity: {city}")
-                    for book_name, contact in entries:
-                        print(f"[Book: {book_name}] {contact}")
 
         elif main_choice == "7":
-            grouped = system.view_all_grouped_by_state()
-            if not grouped:
+            if not show_grouped(system.iter_grouped_pages("state"), "State"):
                 print("No contacts found.")
-            else:
-                for state, entries in grouped.items():
-                    print(f"\nState: {state}")
-                    for book_name, contact in entries:
-                        print(f"[Book: {book_name}] {contact}")
 
         elif main_choice == "8":
             city_counts = system.count_by_city()
@@ -0,0 +1,287 @@
+"""
+metrics.py
+
+Opt-in instrumentation of the Address Book System.
+
+Methods decorated with `instrumented` record, while metrics are enabled:
+- a latency histogram and call and error counts per operation,
+- the number of rows read or written, for imports and exports,
+- hit and miss counts, for lookups.
+
+Metrics are disabled by default. Decorated methods are only wrapped while
+metrics are enabled, so they have no overhead otherwise (bound methods taken
+before `enable()` stay uninstrumented). Read the metrics with `snapshot()`, or
+write them in the Prometheus text format with `write_prometheus(path)`, e.g.
+for the node exporter's textfile collector.
+
+Classes:
+- Metrics: The registry of collected metrics.
+- instrumented: Decorator that marks a method for instrumentation.
+
+Functions:
+- enable / disable / reset: Control collection.
+- snapshot: The collected metrics as a dict.
+- write_prometheus: Write the collected metrics to a file.
+"""
+
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from functools import wraps
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+PROMETHEUS_PREFIX = "address_book"
+
+
+class _Histogram:
+    """
+    Latency observations of one operation, counted per bucket.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self):
+        """
+        Returns:
+            list: (upper_bound, count) pairs, counting every observation up to
+            each bound, ending with (inf, count).
+        """
+        total = 0
+        pairs = []
+        for bound, count in zip((*LATENCY_BUCKETS, float("inf")), self.buckets):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class Metrics:
+    """
+    Collects the metrics recorded by instrumented methods.
+
+    Attributes:
+        enabled (bool): Whether marked methods are currently instrumented.
+        latency (dict): Maps each operation to its latency histogram.
+        errors (dict): Maps each operation to the number of calls that raised.
+        rows (dict): Maps each operation to [rows, seconds] processed.
+        lookups (dict): Maps each operation to [hits, misses].
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        """
+        Discards everything collected so far.
+        """
+        self.latency = defaultdict(_Histogram)
+        self.errors = defaultdict(int)
+        self.rows = defaultdict(lambda: [0, 0.0])
+        self.lookups = defaultdict(lambda: [0, 0])
+
+    def observe(self, operation, seconds):
+        self.latency[operation].observe(seconds)
+
+    def error(self, operation):
+        self.errors[operation] += 1
+
+    def add_rows(self, operation, rows, seconds):
+        totals = self.rows[operation]
+        totals[0] += rows
+        totals[1] += seconds
+
+    def lookup(self, operation, hit):
+        self.lookups[operation][0 if hit else 1] += 1
+
+    def snapshot(self):
+        """
+        Returns the collected metrics.
+
+        Returns:
+            dict: Maps each operation to a dict with "calls", "errors",
+            "seconds" (total), "latency" (cumulative (upper_bound, count)
+            pairs) and, where recorded, "rows" and "rows_per_second", or
+            "hits" and "misses".
+        """
+        operations = {}
+        for operation in sorted({*self.latency, *self.errors}):
+            histogram = self.latency.get(operation) or _Histogram()
+            entry = operations[operation] = {
+                "calls": histogram.count + self.errors.get(operation, 0),
+                "errors": self.errors.get(operation, 0),
+                "seconds": histogram.sum,
+                "latency": histogram.cumulative(),
+            }
+            if operation in self.rows:
+                rows, seconds = self.rows[operation]
+                entry["rows"] = rows
+                entry["rows_per_second"] = rows / seconds if seconds else 0.0
+            if operation in self.lookups:
+                entry["hits"], entry["misses"] = self.lookups[operation]
+        return operations
+
+    def prometheus(self):
+        """
+        Returns:
+            str: The collected metrics in the Prometheus text exposition format.
+        """
+        prefix = PROMETHEUS_PREFIX
+        lines = [f"# HELP {prefix}_operation_seconds Latency of address book operations.",
+                 f"# TYPE {prefix}_operation_seconds histogram"]
+        for operation, histogram in sorted(self.latency.items()):
+            label = f'operation="{operation}"'
+            for bound, count in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_operation_seconds_bucket{{{label},le="{le}"}} {count}')
+            lines.append(f"{prefix}_operation_seconds_sum{{{label}}} {histogram.sum!r}")
+            lines.append(f"{prefix}_operation_seconds_count{{{label}}} {histogram.count}")
+
+        lines += [f"# HELP {prefix}_operation_errors_total Calls that raised an exception.",
+                  f"# TYPE {prefix}_operation_errors_total counter"]
+        lines += [f'{prefix}_operation_errors_total{{operation="{operation}"}} {count}'
+                  for operation, count in sorted(self.errors.items())]
+
+        lines += [f"# HELP {prefix}_rows_total Rows read or written by imports and exports.",
+                  f"# TYPE {prefix}_rows_total counter"]
+        lines += [f'{prefix}_rows_total{{operation="{operation}"}} {rows}'
+                  for operation, (rows, _) in sorted(self.rows.items())]
+        lines += [f"# HELP {prefix}_rows_seconds_total Time spent on imports and exports.",
+                  f"# TYPE {prefix}_rows_seconds_total counter"]
+        lines += [f'{prefix}_rows_seconds_total{{operation="{operation}"}} {seconds!r}'
+                  for operation, (_, seconds) in sorted(self.rows.items())]
+
+        lines += [f"# HELP {prefix}_lookups_total Lookups by result.",
+                  f"# TYPE {prefix}_lookups_total counter"]
+        for operation, (hits, misses) in sorted(self.lookups.items()):
+            lines.append(f'{prefix}_lookups_total{{operation="{operation}",result="hit"}} {hits}')
+            lines.append(f'{prefix}_lookups_total{{operation="{operation}",result="miss"}} {misses}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Writes the collected metrics in the Prometheus text format. The file
+        is replaced atomically, so a scraper never reads a partial file.
+
+        Args:
+            path (str): The file to write.
+        """
+        temporary = f"{os.fspath(path)}.tmp"
+        with open(temporary, "w") as file:
+            file.write(self.prometheus())
+        os.replace(temporary, path)
+
+
+METRICS = Metrics()
+
+
+# (class, attribute name, function, rows, hit) for every instrumented method.
+_SITES = []
+
+
+def _timed(func, operation, rows, hit):
+    """
+    Wraps a method so that each call is recorded in METRICS.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            METRICS.error(operation)
+            raise
+        elapsed = time.perf_counter() - start
+        METRICS.observe(operation, elapsed)
+        if rows is not None:
+            METRICS.add_rows(operation, rows(args[0], result), elapsed)
+        if hit is not None:
+            METRICS.lookup(operation, hit(result))
+        return result
+    return wrapper
+
+
+class instrumented:
+    """
+    Decorator that marks a method for instrumentation.
+
+    The method itself is left unchanged, so it costs nothing while metrics are
+    disabled. `enable()` replaces every marked method on its class with a
+    wrapper that records its metrics, and `disable()` puts the original back.
+    The operation is named after the method's qualified name, e.g.
+    "AddressBook.add_contact".
+
+    Args:
+        rows (callable, optional): Called as rows(self, result) to get the
+            number of rows a call read or wrote.
+        hit (callable, optional): Called as hit(result) to tell whether a
+            lookup found something.
+    """
+
+    def __init__(self, rows=None, hit=None):
+        self.rows = rows
+        self.hit = hit
+        self.func = None
+
+    def __call__(self, func):
+        self.func = func
+        return self
+
+    def __set_name__(self, owner, name):
+        _SITES.append((owner, name, self.func, self.rows, self.hit))
+        setattr(owner, name, _timed(self.func, self.func.__qualname__, self.rows, self.hit)
+                if METRICS.enabled else self.func)
+
+
+def enable():
+    """
+    Starts collecting metrics by instrumenting every marked method.
+    """
+    METRICS.enabled = True
+    for owner, name, func, rows, hit in _SITES:
+        setattr(owner, name, _timed(func, func.__qualname__, rows, hit))
+
+
+def disable():
+    """
+    Stops collecting metrics and restores the uninstrumented methods.
+    Already collected metrics are kept.
+    """
+    METRICS.enabled = False
+    for owner, name, func, _, _ in _SITES:
+        setattr(owner, name, func)
+
+
+def reset():
+    """
+    Discards all collected metrics.
+    """
+    METRICS.reset()
+
+
+def snapshot():
+    """
+    Returns:
+        dict: The collected metrics; see Metrics.snapshot.
+    """
+    return METRICS.snapshot()
+
+
+def write_prometheus(path):
+    """
+    Writes the collected metrics to `path` in the Prometheus text format.
+
+    Args:
+        path (str): The file to write.
+    """
+    METRICS.write_prometheus(path)
@@ -0,0 +1,180 @@
+"""
+parallel_import.py
+
+Multiprocess import of large CSV and NDJSON files into an AddressBook.
+
+Validating contacts is CPU-bound, so a single import uses one core. The
+functions here split the file into byte ranges that start and end on line
+boundaries and validate the ranges in worker processes. Each worker returns
+the validated field values as plain tuples together with its errors, and the
+parent merges the ranges in file order into the address book, which skips
+duplicate names as a normal import does.
+
+Records must not span lines: CSV fields containing line breaks are not
+supported.
+
+Functions:
+- import_csv_parallel: Import a CSV file using several processes.
+- import_ndjson_parallel: Import an NDJSON file using several processes.
+"""
+
+import csv
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from address_book_system import (IMPORT_CHUNK_SIZE, Contact, ImportReport, _CONTACT_FIELDS,
+                                 _chunked, _validate_chunk, iter_ndjson)
+
+# Number of byte ranges per worker; more, smaller ranges balance the load
+# when some parts of the file are slower to validate than others.
+RANGES_PER_WORKER = 4
+
+
+def _byte_ranges(filename, start, parts):
+    """
+    Splits the bytes of a file from `start` to its end into ranges that each
+    begin at the start of a line.
+
+    Args:
+        filename (str): The file to split.
+        start (int): The offset of the first data line.
+        parts (int): The number of ranges wanted.
+
+    Returns:
+        list: (start, end) byte offsets, in file order, none of them empty.
+    """
+    size = os.path.getsize(filename)
+    boundaries = [start]
+    with open(filename, 'rb') as file:
+        for i in range(1, parts):
+            offset = start + (size - start) * i // parts
+            if offset <= boundaries[-1]:
+                continue
+            file.seek(offset - 1)
+            file.readline()  # Move to the start of the next line.
+            offset = file.tell()
+            if boundaries[-1] < offset < size:
+                boundaries.append(offset)
+    boundaries.append(size)
+    return [(lo, hi) for lo, hi in zip(boundaries, boundaries[1:]) if lo < hi]
+
+
+def _read_range(filename, start, end):
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        return file.read(end - start).decode()
+
+
+def _validate_rows(filename, rows):
+    """
+    Validates the rows of one range.
+
+    Returns:
+        tuple: (row_count, values, error_count, errors), where values holds a
+        tuple of field values per valid contact and errors holds
+        (row_number, message) pairs numbered from 1 within the range.
+    """
+    report = ImportReport(filename)
+    values = []
+    for chunk in _chunked(rows, IMPORT_CHUNK_SIZE):
+        for contact in _validate_chunk(chunk, report.rows + 1, report):
+            values.append(tuple(getattr(contact, field) for field in _CONTACT_FIELDS))
+        report.rows += len(chunk)
+    return report.rows, values, report.error_count, report.errors
+
+
+def _validate_csv_range(filename, start, end, fieldnames):
+    """
+    Worker: parses and validates the CSV rows in a byte range.
+    """
+    text = io.StringIO(_read_range(filename, start, end), newline='')
+    return _validate_rows(filename, csv.DictReader(text, fieldnames=fieldnames))
+
+
+def _validate_ndjson_range(filename, start, end):
+    """
+    Worker: parses and validates the NDJSON records in a byte range.
+    """
+    return _validate_rows(filename, iter_ndjson(io.StringIO(_read_range(filename, start, end))))
+
+
+def _run(book, filename, worker, start, extra_args, workers):
+    """
+    Validates the ranges of a file in a process pool and merges the results
+    into `book` in file order, one batch per range. Each range is merged as
+    soon as it and the ranges before it are done, and is then released.
+
+    Returns:
+        ImportReport: The import summary.
+    """
+    workers = workers or os.cpu_count() or 1
+    report = ImportReport(filename)
+    began = time.perf_counter()
+    ranges = _byte_ranges(filename, start, workers * RANGES_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(worker, filename, lo, hi, *extra_args) for lo, hi in ranges)
+        while pending:
+            rows, values, error_count, errors = pending.popleft().result()
+            for row_number, message in errors:
+                report.add_error(report.rows + row_number, message)
+            # Errors beyond those a worker kept are counted but not described.
+            report.error_count += error_count - len(errors)
+            imported = book._insert_many(Contact.from_trusted(dict(zip(_CONTACT_FIELDS, fields)))
+                                         for fields in values)
+            report.imported += imported
+            report.duplicates += len(values) - imported
+            report.rows += rows
+            del values, errors
+    report.elapsed = time.perf_counter() - began
+    return report
+
+
+def import_csv_parallel(book, filename, workers=None):
+    """
+    Imports a CSV file with a header row into an address book, validating it
+    in `workers` processes.
+
+    Args:
+        book (AddressBook): The address book to import into.
+        filename (str): The CSV file.
+        workers (int, optional): The number of worker processes. Defaults to
+            the number of CPUs.
+
+    Returns:
+        ImportReport or None: The import summary, or None if the file was not found.
+    """
+    try:
+        with open(filename, 'rb') as file:
+            header = file.readline()
+    except FileNotFoundError:
+        print(f"File '{filename}' not found.")
+        return None
+    fieldnames = next(csv.reader([header.decode()]), [])
+    report = _run(book, filename, _validate_csv_range, len(header), (fieldnames,), workers)
+    print(f"Address book imported from {filename} successfully: {report.summary()}")
+    return report
+
+
+def import_ndjson_parallel(book, filename, workers=None):
+    """
+    Imports a newline-delimited JSON file into an address book, validating it
+    in `workers` processes.
+
+    Args:
+        book (AddressBook): The address book to import into.
+        filename (str): The NDJSON file.
+        workers (int, optional): The number of worker processes. Defaults to
+            the number of CPUs.
+
+    Returns:
+        ImportReport or None: The import summary, or None if the file was not found.
+    """
+    if not os.path.exists(filename):
+        print(f"File '{filename}' not found.")
+        return None
+    report = _run(book, filename, _validate_ndjson_range, 0, (), workers)
+    print(f"Address book imported from {filename} successfully: {report.summary()}")
+    return report
@@ -0,0 +1,568 @@
+"""
+query.py
+
+Composable queries across all address books of an AddressBookSystem.
+
+A query combines conditions on any Contact field, and on the book holding the
+contact, with `&` (and) and `|` (or):
+
+    from query import Between, Eq, InBooks, Prefix
+
+    (system.query(Eq("city", "Pune") & Between("zip_code", "411000", "411099"))
+           .where(Prefix("last_name", "Na") | Eq("state", "Kerala"))
+           .where(InBooks("Work", "Home"))
+           .order_by("last_name", "first_name")
+           .limit(20))
+
+Text comparisons are case-insensitive, as in the rest of the system.
+
+Before it runs, a query is planned. Every part of the condition that an index
+can answer is a candidate access path:
+- an equality on city, state or ZIP code, through the system's indexes or its
+  storage backend,
+- a prefix or range on city, state or ZIP code, through the in-memory
+  indexes, reading each distinct value once,
+- an equality on both first and last name, through each book's name index,
+- a disjunction whose every branch has such a path, as the union of them.
+The path expected to return the fewest contacts is chosen; when there is
+none, the query reads the books it can match once instead.
+Either way, the whole condition is then checked on each contact in a single
+pass. `Query.explain()` shows the chosen plan and its estimated rows.
+
+Classes:
+- Condition: The base class of conditions.
+- Eq, Prefix, Between: Conditions on one Contact field.
+- InBooks: A condition on the book holding the contact.
+- And, Or: Conjunctions and disjunctions of conditions.
+- Query: A query, its ordering and limit, and its plan.
+"""
+
+import heapq
+from itertools import islice
+
+from address_book_system import _CONTACT_FIELDS, ContactIndex, _name_key, _normalize
+
+# Fields the system-wide indexes and storage backends can look up.
+INDEXED_FIELDS = ContactIndex.FIELDS
+
+
+def _check_field(field):
+    if field not in _CONTACT_FIELDS:
+        raise ValueError(f"Cannot query by '{field}'. Choose from {', '.join(_CONTACT_FIELDS)}.")
+    return field
+
+
+class Condition:
+    """
+    A condition on a contact and the book holding it. Combine conditions with
+    `&` and `|`.
+    """
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def compile(self):
+        """
+        Returns:
+            callable: A function of (book_name, contact) returning True for
+            the contacts that satisfy the condition.
+        """
+        raise NotImplementedError
+
+    def describe(self):
+        """
+        Returns:
+            str: The condition in a readable form.
+        """
+        raise NotImplementedError
+
+    def books(self):
+        """
+        Returns:
+            set or None: The only books that can hold matching contacts, or
+            None if any book can.
+        """
+        return None
+
+    def access_paths(self, system):
+        """
+        Lists the ways the system can find a superset of the matching
+        contacts without reading every contact.
+
+        Args:
+            system (AddressBookSystem): The system queried.
+
+        Returns:
+            list: Plan nodes.
+        """
+        return []
+
+
+class Eq(Condition):
+    """
+    Matches contacts whose field equals a value, case-insensitively.
+    """
+
+    def __init__(self, field, value):
+        self.field = _check_field(field)
+        self.value = value
+        self.key = _normalize(value)
+
+    def compile(self):
+        field, key = self.field, self.key
+        return lambda book_name, contact: _normalize(getattr(contact, field)) == key
+
+    def describe(self):
+        return f"{self.field} = {self.value!r}"
+
+    def access_paths(self, system):
+        if self.field in INDEXED_FIELDS:
+            return [_IndexLookup(system, self.field, self.key, f"{self.field} = {self.key!r}")]
+        return []
+
+
+class Prefix(Condition):
+    """
+    Matches contacts whose field starts with a prefix, case-insensitively,
+    e.g. `Prefix("last_name", "Na")`.
+    """
+
+    def __init__(self, field, prefix):
+        self.field = _check_field(field)
+        self.prefix = prefix
+        self.key = _normalize(prefix)
+
+    def compile(self):
+        field, key = self.field, self.key
+        return lambda book_name, contact: _normalize(getattr(contact, field)).startswith(key)
+
+    def describe(self):
+        return f"{self.field} STARTS WITH {self.prefix!r}"
+
+    def access_paths(self, system):
+        if self.field in INDEXED_FIELDS and system.index is not None:
+            key = self.key
+            return [_IndexLookup(system, self.field, lambda value: value.startswith(key),
+                                 f"{self.field} STARTS WITH {key!r}")]
+        return []
+
+
+class Between(Condition):
+    """
+    Matches contacts whose field lies between two values, inclusive,
+    comparing the case-folded text, e.g. `Between("zip_code", "411000", "411099")`.
+    Either bound may be None.
+    """
+
+    def __init__(self, field, low=None, high=None):
+        if low is None and high is None:
+            raise ValueError("A range needs a lower or an upper bound.")
+        self.field = _check_field(field)
+        self.low = low
+        self.high = high
+
+    def _match(self):
+        low = _normalize(self.low) if self.low is not None else None
+        high = _normalize(self.high) if self.high is not None else None
+        if high is None:
+            return lambda value: low <= value
+        if low is None:
+            return lambda value: value <= high
+        return lambda value: low <= value <= high
+
+    def compile(self):
+        field, match = self.field, self._match()
+        return lambda book_name, contact: match(_normalize(getattr(contact, field)))
+
+    def describe(self):
+        if self.high is None:
+            return f"{self.field} >= {self.low!r}"
+        if self.low is None:
+            return f"{self.field} <= {self.high!r}"
+        return f"{self.field} BETWEEN {self.low!r} AND {self.high!r}"
+
+    def access_paths(self, system):
+        if self.field in INDEXED_FIELDS and system.index is not None:
+            return [_IndexLookup(system, self.field, self._match(), self.describe())]
+        return []
+
+
+class InBooks(Condition):
+    """
+    Matches the contacts of the named address books.
+    """
+
+    def __init__(self, *names):
+        if not names:
+            raise ValueError("Name at least one address book.")
+        self.names = frozenset(names)
+
+    def compile(self):
+        names = self.names
+        return lambda book_name, contact: book_name in names
+
+    def describe(self):
+        return f"book IN ({', '.join(map(repr, sorted(self.names)))})"
+
+    def books(self):
+        return set(self.names)
+
+
+class And(Condition):
+    """
+    Matches the contacts that satisfy every one of its conditions.
+    """
+
+    def __init__(self, *conditions):
+        self.conditions = []
+        for condition in conditions:
+            self.conditions.extend(condition.conditions if isinstance(condition, And) else [condition])
+
+    def compile(self):
+        predicates = [condition.compile() for condition in self.conditions]
+
+        def match(book_name, contact):
+            for predicate in predicates:
+                if not predicate(book_name, contact):
+                    return False
+            return True
+
+        return match
+
+    def describe(self):
+        return " AND ".join(_parenthesized(condition, Or) for condition in self.conditions)
+
+    def books(self):
+        books = None
+        for condition in self.conditions:
+            names = condition.books()
+            if names is not None:
+                books = names if books is None else books & names
+        return books
+
+    def access_paths(self, system):
+        paths = [path for condition in self.conditions for path in condition.access_paths(system)]
+        names = {condition.field: condition.value for condition in self.conditions
+                 if isinstance(condition, Eq) and condition.field in ("first_name", "last_name")}
+        if len(names) == 2:
+            paths.append(_NameLookup(system, names["first_name"], names["last_name"], self.books()))
+        return paths
+
+
+class Or(Condition):
+    """
+    Matches the contacts that satisfy at least one of its conditions.
+    """
+
+    def __init__(self, *conditions):
+        self.conditions = []
+        for condition in conditions:
+            self.conditions.extend(condition.conditions if isinstance(condition, Or) else [condition])
+
+    def compile(self):
+        predicates = [condition.compile() for condition in self.conditions]
+
+        def match(book_name, contact):
+            for predicate in predicates:
+                if predicate(book_name, contact):
+                    return True
+            return False
+
+        return match
+
+    def describe(self):
+        return " OR ".join(_parenthesized(condition, And) for condition in self.conditions)
+
+    def books(self):
+        books = set()
+        for condition in self.conditions:
+            names = condition.books()
+            if names is None:
+                return None
+            books |= names
+        return books
+
+    def access_paths(self, system):
+        branches = []
+        for condition in self.conditions:
+            paths = condition.access_paths(system)
+            if not paths:
+                return []
+            branches.append(min(paths, key=lambda path: path.estimate))
+        return [_Union(branches)]
+
+
+class _Everything(Condition):
+    """
+    The condition of a query without one.
+    """
+
+    def compile(self):
+        return lambda book_name, contact: True
+
+    def describe(self):
+        return "TRUE"
+
+
+def _parenthesized(condition, kind):
+    text = condition.describe()
+    return f"({text})" if isinstance(condition, kind) else text
+
+
+# Plan nodes: each finds candidate (book_name, contact) entries.
+class _Scan:
+    """
+    Reads every contact of all books, or of the named books.
+    """
+
+    def __init__(self, system, books=None):
+        self.system = system
+        self.books = books
+        self.estimate = system._entry_count(books)
+
+    def entries(self):
+        return self.system._iter_entries(self.books)
+
+    def explain(self, depth):
+        where = "all books" if self.books is None else f"books {', '.join(map(repr, sorted(self.books)))}"
+        return [f"{'  ' * depth}Scan {where} (est. {self.estimate:,} rows)"]
+
+
+class _IndexLookup:
+    """
+    Reads the contacts stored under one value, or under every value matching
+    a function, in a system-wide index.
+    """
+
+    def __init__(self, system, field, key, description):
+        self.system = system
+        self.field = field
+        self.key = key
+        self.description = description
+        self.estimate = system._index_count(field, key)
+
+    def entries(self):
+        if callable(self.key):
+            return self.system._index_entries(self.field, self.key)
+        return self.system._search(self.field, self.key)
+
+    def explain(self, depth):
+        kind = "Storage index" if self.system.storage is not None else "Index"
+        return [f"{'  ' * depth}{kind} lookup {self.description} (est. {self.estimate:,} rows)"]
+
+
+class _NameLookup:
+    """
+    Looks a name up in the name index of each book.
+    """
+
+    def __init__(self, system, first_name, last_name, books=None):
+        self.system = system
+        self.first_name = first_name
+        self.last_name = last_name
+        self.books = list(system.books) if books is None else [name for name in system.books if name in books]
+        self.estimate = len(self.books)
+
+    def entries(self):
+        for book_name in self.books:
+            contact = self.system.books[book_name]._find(self.first_name, self.last_name)
+            if contact is not None:
+                yield book_name, contact
+
+    def explain(self, depth):
+        return [f"{'  ' * depth}Name lookup {self.first_name!r} {self.last_name!r} "
+                f"in {len(self.books)} book(s) (est. {self.estimate:,} rows)"]
+
+
+class _Union:
+    """
+    Combines the entries of several plans, each contact once. Contacts are
+    told apart by book and name, since storage backends build a new Contact
+    for every row they read.
+    """
+
+    def __init__(self, plans):
+        self.plans = plans
+        self.estimate = sum(plan.estimate for plan in plans)
+
+    def entries(self):
+        seen = set()
+        for plan in self.plans:
+            for book_name, contact in plan.entries():
+                key = (book_name, *_name_key(contact.first_name, contact.last_name))
+                if key not in seen:
+                    seen.add(key)
+                    yield book_name, contact
+
+    def explain(self, depth):
+        lines = [f"{'  ' * depth}Union (est. {self.estimate:,} rows)"]
+        for plan in self.plans:
+            lines.extend(plan.explain(depth + 1))
+        return lines
+
+
+class Query:
+    """
+    A query across all books of an AddressBookSystem. `where`, `order_by`
+    and `limit` return a new Query, so a query can be refined step by step.
+
+    Iterating over a query, or calling `all()`, plans and runs it and yields
+    (book_name, contact) tuples. Without `order_by`, the order of the results
+    depends on the plan.
+    """
+
+    def __init__(self, system, condition=None, order=(), descending=False, limit=None):
+        """
+        Initializes a query.
+
+        Args:
+            system (AddressBookSystem): The system to query.
+            condition (Condition, optional): The condition to match.
+            order (tuple): The Contact fields to order the results by.
+            descending (bool): Order the results from largest to smallest.
+            limit (int, optional): The maximum number of results.
+        """
+        self.system = system
+        self.condition = condition
+        self.order = order
+        self.descending = descending
+        self.max_results = limit
+
+    def _copy(self, **changes):
+        settings = {"condition": self.condition, "order": self.order, "descending": self.descending,
+                    "limit": self.max_results}
+        settings.update(changes)
+        return Query(self.system, **settings)
+
+    def where(self, condition=None, **fields):
+        """
+        Adds conditions that results must also satisfy.
+
+        Args:
+            condition (Condition, optional): A condition.
+            **fields: Field values that must match case-insensitively.
+
+        Returns:
+            Query: The refined query.
+
+        Raises:
+            ValueError: If a field is not a Contact field.
+        """
+        conditions = [self.condition, condition, *(Eq(field, value) for field, value in fields.items())]
+        conditions = [condition for condition in conditions if condition is not None]
+        if not conditions:
+            return self
+        return self._copy(condition=conditions[0] if len(conditions) == 1 else And(*conditions))
+
+    def order_by(self, *fields, descending=False):
+        """
+        Orders the results by one or more Contact fields, case-insensitively.
+
+        Args:
+            *fields (str): The fields, most significant first.
+            descending (bool): Order from largest to smallest.
+
+        Returns:
+            Query: The ordered query.
+
+        Raises:
+            ValueError: If a field is not a Contact field.
+        """
+        return self._copy(order=tuple(map(_check_field, fields)), descending=descending)
+
+    def limit(self, count):
+        """
+        Keeps at most `count` results.
+
+        Args:
+            count (int): The maximum number of results.
+
+        Returns:
+            Query: The limited query.
+
+        Raises:
+            ValueError: If `count` is negative.
+        """
+        if count < 0:
+            raise ValueError("A limit cannot be negative.")
+        return self._copy(limit=count)
+
+    def plan(self):
+        """
+        Chooses how to find the candidate contacts: the access path with the
+        fewest estimated rows or, without one, a scan of the books the query
+        can match. Scans are only sized when they are chosen, since that reads
+        every book.
+
+        Returns:
+            The plan node, with an `estimate` of the rows it reads.
+        """
+        condition = self.condition or _Everything()
+        paths = condition.access_paths(self.system)
+        if paths:
+            return min(paths, key=lambda path: path.estimate)
+        return _Scan(self.system, condition.books())
+
+    def explain(self):
+        """
+        Describes how the query will run, e.g.
+
+            Limit 20 (est. 20 rows)
+              Sort by last_name, first_name
+                Filter city = 'Pune' AND last_name STARTS WITH 'Na'
+                  Index lookup city = 'pune' (est. 1,250 rows)
+
+        Returns:
+            str: The plan, outermost step first.
+        """
+        plan = self.plan()
+        steps = []
+        if self.max_results is not None:
+            steps.append(f"Limit {self.max_results} (est. {min(plan.estimate, self.max_results):,} rows)")
+        if self.order:
+            steps.append(f"Sort by {', '.join(self.order)}{' descending' if self.descending else ''}")
+        if self.condition is not None:
+            steps.append(f"Filter {self.condition.describe()}")
+        lines = [f"{'  ' * depth}{step}" for depth, step in enumerate(steps)]
+        lines.extend(plan.explain(len(steps)))
+        return "\n".join(lines)
+
+    def __iter__(self):
+        entries = self.plan().entries()
+        if self.condition is not None:
+            predicate = self.condition.compile()
+            entries = (entry for entry in entries if predicate(*entry))
+        if self.order:
+            fields = self.order
+
+            def sort_key(entry):
+                return tuple(_normalize(getattr(entry[1], field)) for field in fields)
+
+            if self.max_results is not None:
+                pick = heapq.nlargest if self.descending else heapq.nsmallest
+                return iter(pick(self.max_results, entries, key=sort_key))
+            return iter(sorted(entries, key=sort_key, reverse=self.descending))
+        if self.max_results is not None:
+            return islice(entries, self.max_results)
+        return iter(entries)
+
+    def all(self):
+        """
+        Runs the query.
+
+        Returns:
+            list: The matching (book_name, contact) tuples.
+        """
+        return list(self)
+
+    def count(self):
+        """
+        Runs the query and counts its results.
+
+        Returns:
+            int: The number of matching contacts, at most the limit.
+        """
+        return sum(1 for _ in self)
@@ -0,0 +1,259 @@
+"""
+search_index.py
+
+Type-ahead search over contact names, cities and email domains.
+
+A SearchIndex keeps, for each searchable field, the distinct terms in sorted
+order. The sorted list is walked as an implicit trie (each node is the range of
+terms sharing a prefix, found with bisect), carrying one row of the Levenshtein
+table per node. Nodes are expanded closest first and branches that are already
+too far from the query are pruned, so a lookup visits only the few prefixes
+within the allowed number of typos. The index is an AddressBookObserver, so it
+is updated as contacts are added, edited and deleted.
+
+Classes:
+- SearchIndex: The type-ahead index.
+"""
+
+import heapq
+from bisect import bisect_left, insort
+
+from address_book_system import AddressBookObserver, _name_key, _normalize
+
+# How to read the searchable terms of each field from a contact. Names are
+# indexed both as "first last" and by last name alone.
+FIELD_TERMS = {
+    "name": lambda c: (f"{c.first_name} {c.last_name}", c.last_name),
+    "city": lambda c: (c.city,),
+    "email_domain": lambda c: (c.email.rsplit("@", 1)[-1],),
+}
+
+# The maximum number of trie nodes expanded per query, which bounds its latency.
+NODE_BUDGET = 50
+
+# Sorts after any character that can follow a prefix.
+_MAX_CHAR = "\U0010ffff"
+
+
+def _next_row(query, row, depth, band, char, too_far):
+    """
+    Extends a Levenshtein row by one character, computing only the cells in
+    `band` and leaving the others at `too_far`.
+
+    Args:
+        query (str): The query the rows are computed against.
+        row (list): The row for the current prefix, of length len(query) + 1.
+        depth (int): The length of the current prefix.
+        band (range): The query positions that can still be within range.
+        char (str or None): The next character of the prefix.
+        too_far (int): The value used for cells that are out of range.
+
+    Returns:
+        list: The row for the prefix extended by `char`.
+    """
+    child = [depth + 1] + [too_far] * len(query)
+    for k in band:
+        child[k] = min(row[k] + 1, child[k - 1] + 1, row[k - 1] + (query[k - 1] != char))
+    return child
+
+
+class _TermIndex:
+    """
+    The terms of one field, kept in a sorted list.
+
+    Attributes:
+        entries (dict): Maps each term to a dict of
+            (book_name, name_key) -> (book_name, contact).
+        terms (list): The distinct terms, sorted.
+        bulk_loading (bool): While True, new terms are appended unsorted and
+            the caller must sort `terms` afterwards.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.terms = []
+        self.bulk_loading = False
+
+    def add(self, term, key, entry):
+        bucket = self.entries.get(term)
+        if bucket is None:
+            bucket = self.entries[term] = {}
+            if self.bulk_loading:
+                self.terms.append(term)
+            else:
+                insort(self.terms, term)
+        bucket[key] = entry
+
+    def remove(self, term, key):
+        bucket = self.entries[term]
+        del bucket[key]
+        if not bucket:
+            del self.entries[term]
+            del self.terms[bisect_left(self.terms, term)]
+
+    def closest(self, query, max_distance, limit):
+        """
+        Finds up to `limit` terms with a prefix within `max_distance` edits of
+        `query`, closest first.
+
+        Trie nodes are expanded best-first by the smallest value in their
+        Levenshtein row, which bounds the distance of every term below them,
+        so the walk stops as soon as no unexplored node can beat the terms
+        already found. At most NODE_BUDGET nodes are expanded.
+
+        Args:
+            query (str): The normalized query.
+            max_distance (int): The largest edit distance accepted.
+            limit (int): The number of terms wanted.
+
+        Returns:
+            dict: Maps each term found to its distance.
+        """
+        terms = self.terms
+        too_far = max_distance + 1
+        found = {}
+        heap = [(0, 0, 0, list(range(len(query) + 1)), 0, len(terms))]
+        pushed = 1
+        budget = NODE_BUDGET
+        while heap and budget:
+            bound, _, depth, row, lo, hi = heapq.heappop(heap)
+            if bound > max_distance or (len(found) >= limit and bound >= max(found.values())):
+                break
+            budget -= 1
+            if row[-1] <= max_distance:
+                for term in terms[lo:min(hi, lo + limit)]:
+                    found[term] = min(found.get(term, row[-1]), row[-1])
+                if row[-1] == bound:
+                    # Nothing below this node can be closer than the node itself.
+                    continue
+            if depth >= len(query) + max_distance:
+                continue
+            # Only cells within max_distance of the diagonal can stay in range.
+            # A child whose character matches no query character in that band
+            # gets the same row as every other such child, so it is computed once.
+            band = range(max(1, depth + 1 - max_distance), min(len(query), depth + 1 + max_distance) + 1)
+            band_chars = {query[k - 1] for k in band}
+            mismatch = _next_row(query, row, depth, band, None, too_far)
+            children = []
+            if min(mismatch) <= max_distance:
+                i = lo
+                while i < hi:
+                    term = terms[i]
+                    if len(term) <= depth:
+                        i += 1
+                        continue
+                    j = bisect_left(terms, term[:depth + 1] + _MAX_CHAR, i, hi)
+                    children.append((term[depth], i, j))
+                    i = j
+            else:
+                prefix = terms[lo][:depth]
+                for char in band_chars:
+                    i = bisect_left(terms, prefix + char, lo, hi)
+                    j = bisect_left(terms, prefix + char + _MAX_CHAR, i, hi)
+                    if i < j:
+                        children.append((char, i, j))
+            for char, i, j in children:
+                child = _next_row(query, row, depth, band, char, too_far) if char in band_chars else mismatch
+                child_bound = min(child)
+                if child_bound <= max_distance:
+                    heapq.heappush(heap, (child_bound, -pushed, depth + 1, child, i, j))
+                    pushed += 1
+        return found
+
+
+class SearchIndex(AddressBookObserver):
+    """
+    Prefix and fuzzy search over contact names, cities and email domains.
+    """
+
+    def __init__(self):
+        """
+        Initializes one empty term index per field in FIELD_TERMS.
+        """
+        self.fields = {field: _TermIndex() for field in FIELD_TERMS}
+
+    @classmethod
+    def from_system(cls, system):
+        """
+        Builds an index over every contact of an AddressBookSystem, sorting
+        each term list once instead of inserting terms one by one.
+
+        Args:
+            system (AddressBookSystem): The system to index.
+
+        Returns:
+            SearchIndex: The populated index.
+        """
+        index = cls()
+        for term_index in index.fields.values():
+            term_index.bulk_loading = True
+        for book_name, book in system.books.items():
+            for contact in book.contacts:
+                index.contact_added(book_name, contact)
+        for term_index in index.fields.values():
+            term_index.terms.sort()
+            term_index.bulk_loading = False
+        return index
+
+    def _terms(self, field, contact, values=None):
+        """
+        Returns the normalized terms of a contact, optionally as it was before
+        an update whose previous values are given in `values`.
+        """
+        if values:
+            contact = contact.model_copy(update=values)
+        return {_normalize(term) for term in FIELD_TERMS[field](contact)}
+
+    def contact_added(self, book_name, contact):
+        key = (book_name, _name_key(contact.first_name, contact.last_name))
+        for field, index in self.fields.items():
+            for term in self._terms(field, contact):
+                index.add(term, key, (book_name, contact))
+
+    def contact_removed(self, book_name, contact, old_values=None):
+        old = old_values or {}
+        key = (book_name, _name_key(old.get("first_name", contact.first_name),
+                                    old.get("last_name", contact.last_name)))
+        for field, index in self.fields.items():
+            for term in self._terms(field, contact, old_values):
+                index.remove(term, key)
+
+    def contact_updated(self, book_name, contact, old_values):
+        self.contact_removed(book_name, contact, old_values)
+        self.contact_added(book_name, contact)
+
+    def search(self, text, field="name", limit=10, max_distance=2):
+        """
+        Finds the contacts whose `field` best matches `text`.
+
+        A term matches if some prefix of it is within `max_distance` edits of
+        `text`. Results are ranked by that distance, then by the length of the
+        term, so exact prefix matches come first, shortest first. Short queries
+        allow one edit per four characters, so that a few keystrokes do not
+        match everything.
+
+        Args:
+            text (str): The text typed so far.
+            field (str): One of "name", "city" or "email_domain".
+            limit (int): The maximum number of results.
+            max_distance (int): The largest edit distance accepted.
+
+        Returns:
+            list: Up to `limit` (book_name, contact) tuples, best match first.
+        """
+        if field not in self.fields:
+            raise ValueError(f"Cannot search by '{field}'. Choose one of {', '.join(self.fields)}.")
+        index = self.fields[field]
+        query = _normalize(text.strip())
+        if not query:
+            return []
+        max_distance = min(max_distance, len(query) // 4)
+
+        best = index.closest(query, max_distance, limit)
+        results = {}
+        for term in sorted(best, key=lambda term: (best[term], len(term), term)):
+            for key, entry in index.entries[term].items():
+                results.setdefault(key, entry)
+                if len(results) == limit:
+                    return list(results.values())
+        return list(results.values())
@@ -0,0 +1,325 @@
+"""
+service.py
+
+An asyncio JSON-lines-over-TCP service for an AddressBookSystem.
+
+Clients send one JSON request per line and receive one JSON response per line,
+in the order of their requests. A request names an operation and its
+parameters, plus an optional "id" that is echoed in the response:
+
+    {"id": 1, "op": "add", "book": "Work", "contact": {"first_name": ...}}
+    {"id": 1, "ok": true, "result": {"added": true}}
+    {"id": 2, "op": "search", "field": "city", "value": "Pune"}
+    {"id": 2, "ok": true, "result": [{"book": "Work", "contact": {...}}]}
+
+Failed requests get {"ok": false, "error": "..."}.
+
+Reads are answered directly on the event loop, so any number of clients can
+look up contacts concurrently. Writes go through a single queue and are
+applied by one writer task in batches; the system's storage, if any, is
+flushed once per batch. Because the event loop runs one thing at a time, a
+read never sees a batch half applied.
+
+Operations:
+- Reads: books, get, search, count, suggest.
+- Writes: add_book, add, edit, delete, import.
+
+Classes:
+- AddressBookService: The server.
+- ServiceClient: A minimal client, e.g. for tests and scripts.
+"""
+
+import argparse
+import asyncio
+import json
+
+from address_book_system import AddressBookSystem, Contact, entry_dict
+
+# The maximum number of queued writes applied together.
+WRITE_BATCH_SIZE = 256
+
+# The maximum number of requests from one connection awaiting a response.
+MAX_PIPELINED = 1024
+
+
+def _entries(entries):
+    return [entry_dict(book_name, contact) for book_name, contact in entries]
+
+
+class AddressBookService:
+    """
+    Serves an AddressBookSystem over JSON lines.
+
+    Attributes:
+        system (AddressBookSystem): The system being served.
+        batch_size (int): The maximum number of writes applied together.
+        server (asyncio.Server or None): The listening server, once started.
+    """
+
+    READS = ("books", "get", "search", "count", "suggest")
+    WRITES = ("add_book", "add", "edit", "delete", "import")
+
+    def __init__(self, system=None, batch_size=WRITE_BATCH_SIZE):
+        """
+        Initializes the service.
+
+        Args:
+            system (AddressBookSystem, optional): The system to serve. A new,
+                empty system is created if not given.
+            batch_size (int): The maximum number of writes applied together.
+        """
+        self.system = system if system is not None else AddressBookSystem()
+        self.batch_size = batch_size
+        self.server = None
+        self._writes = None
+        self._writer = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Starts listening and starts the writer task.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port to listen on; 0 picks a free port.
+
+        Returns:
+            int: The port the service listens on.
+        """
+        self._writes = asyncio.Queue()
+        self._writer = asyncio.create_task(self._apply_writes())
+        self.server = await asyncio.start_server(self._serve_client, host, port)
+        return self.port
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """
+        Stops accepting connections, then stops the writer once the writes
+        already queued have been applied.
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self._writer is not None:
+            await self._writes.put(None)
+            await self._writer
+            self._writer = None
+
+    async def serve_forever(self, host="127.0.0.1", port=0):
+        await self.start(host, port)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    # Requests
+    def submit(self, request):
+        """
+        Starts handling one decoded request.
+
+        Args:
+            request (dict): The request, with an "op" key.
+
+        Returns:
+            asyncio.Future: Resolves to the response dict.
+        """
+        future = asyncio.get_running_loop().create_future()
+        op = request.get("op") if isinstance(request, dict) else None
+        if op in self.WRITES:
+            self._writes.put_nowait((request, future))
+        else:
+            future.set_result(self._respond(request, self._read))
+        return future
+
+    async def handle(self, request):
+        """
+        Handles one decoded request.
+
+        Args:
+            request (dict): The request, with an "op" key.
+
+        Returns:
+            dict: The response.
+        """
+        return await self.submit(request)
+
+    def _respond(self, request, apply):
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("A request must be a JSON object.")
+            return {"id": request_id, "ok": True, "result": apply(request)}
+        except (ValueError, KeyError, TypeError) as e:
+            message = f"Missing parameter {e}." if isinstance(e, KeyError) else str(e)
+            return {"id": request_id, "ok": False, "error": message}
+        except Exception as e:
+            # Any other failure is still only this request's: the single
+            # writer must keep answering the requests queued behind it.
+            return {"id": request_id, "ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    def _book(self, name):
+        book = self.system.get_address_book(name)
+        if book is None:
+            raise ValueError(f"Address Book '{name}' not found.")
+        return book
+
+    def _read(self, request):
+        op = request.get("op")
+        if op == "books":
+            return list(self.system.books)
+        if op == "get":
+            contact = self._book(request["book"]).find_contact(request["first_name"], request["last_name"])
+            return contact.model_dump() if contact is not None else None
+        if op == "search":
+            return _entries(self.system.search(request["field"], request["value"]))
+        if op == "count":
+            return dict(self.system.count_by(request["field"]))
+        if op == "suggest":
+            return _entries(self.system.suggest(request["text"], request.get("field", "name"),
+                                                request.get("limit", 10)))
+        raise ValueError(f"Unknown operation '{op}'.")
+
+    def _write(self, request):
+        op = request["op"]
+        if op == "add_book":
+            self.system.add_address_book(request["book"])
+            return None
+        book = self._book(request["book"])
+        if op == "add":
+            return {"added": book.add_contact(Contact(**request["contact"]))}
+        if op == "edit":
+            contact = book.edit_contact_by_name(request["first_name"], request["last_name"], request["updates"])
+            if contact is None:
+                raise ValueError("Contact not found.")
+            return contact.model_dump()
+        if op == "delete":
+            contact = book.delete_contact_by_name(request["first_name"], request["last_name"])
+            if contact is None:
+                raise ValueError("Contact not found.")
+            return contact.model_dump()
+        return book.import_records(request["contacts"], "request", chunk_size=self.batch_size).as_dict()
+
+    async def _apply_writes(self):
+        """
+        The single writer: applies queued writes in batches of up to
+        `batch_size`, flushing storage once per batch.
+        """
+        while True:
+            batch = [await self._writes.get()]
+            while len(batch) < self.batch_size and not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            stopping = None in batch
+            for item in batch:
+                if item is not None:
+                    request, future = item
+                    future.set_result(self._respond(request, self._write))
+            if self.system.storage is not None:
+                self.system.storage.flush()
+            if stopping:
+                return
+
+    # Connections
+    async def _serve_client(self, reader, writer):
+        pending = asyncio.Queue(MAX_PIPELINED)
+        responder = asyncio.create_task(self._send_responses(pending, writer))
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_result({"id": None, "ok": False, "error": "Invalid JSON."})
+                else:
+                    future = self.submit(request)
+                await pending.put(future)
+        except ConnectionError:
+            pass
+        finally:
+            await pending.put(None)
+            await responder
+
+    async def _send_responses(self, pending, writer):
+        """
+        Writes responses in request order, draining the socket only when no
+        further response is ready.
+        """
+        try:
+            while (future := await pending.get()) is not None:
+                writer.write(json.dumps(await future).encode() + b"\n")
+                if pending.empty():
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+class ServiceClient:
+    """
+    A minimal client for AddressBookService that sends one request at a time.
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=0):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def call(self, op, **params):
+        """
+        Sends a request and waits for its response.
+
+        Args:
+            op (str): The operation.
+            **params: The operation's parameters.
+
+        Returns:
+            The operation's result.
+
+        Raises:
+            ValueError: If the service reports an error.
+        """
+        self._next_id += 1
+        self._writer.write(json.dumps({"id": self._next_id, "op": op, **params}).encode() + b"\n")
+        await self._writer.drain()
+        response = json.loads(await self._reader.readline())
+        if not response["ok"]:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve an Address Book System over JSON lines.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", help="SQLite database to store the address books in")
+    args = parser.parse_args(argv)
+
+    storage = None
+    if args.db:
+        from sqlite_storage import SQLiteStorage
+        storage = SQLiteStorage(args.db)
+    service = AddressBookService(AddressBookSystem(storage=storage))
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if storage is not None:
+            storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""
+snapshot.py
+
+A fixed-layout binary snapshot of a whole AddressBookSystem, opened with mmap.
+
+`write_snapshot` stores every distinct string once in a string table and each
+contact as eight 32-bit string ids. It also stores sorted indexes on name,
+city, state and ZIP code, and per-value counts. `MappedSnapshot` maps the file
+read-only and reads these arrays in place, so opening a snapshot costs the same
+whatever its size. A Contact is only decoded when it is accessed. Processes
+that open the same snapshot share its pages in the operating system's cache.
+
+Layout (all integers little-endian):
+- Header: magic, version, number of books, contacts and strings, and the
+  number of sections.
+- Section directory: (name, offset, size) for each section.
+- Sections, each aligned to 8 bytes:
+  - strings.offsets (uint64 x strings + 1) and strings.data (UTF-8).
+  - books (uint32 x 3 per book): name id, first contact row, contact count.
+  - contacts (uint32 x 8 per contact): one string id per Contact field.
+  - <field>.keys, <field>.starts, <field>.rows for the name, city, state and
+    zip_code indexes: the ids of the normalized values in sorted order, where
+    each value's rows start in <field>.rows, and the contact rows.
+  - <field>.values, <field>.counts for city, state and zip_code: the number
+    of contacts per exact value.
+
+Classes:
+- MappedSnapshot: A read-only, memory-mapped view of a snapshot.
+- MappedBook: The contacts of one address book in a snapshot.
+
+Functions:
+- write_snapshot: Write an AddressBookSystem to a snapshot file.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from collections.abc import Sequence
+
+from address_book_system import (AddressBook, AddressBookSystem, Contact, ContactIndex, _CONTACT_FIELDS, _name_key,
+                                 _normalize)
+
+MAGIC = b"ABSNAP\x00\x01"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sIIIII")
+_DIRECTORY_ENTRY = struct.Struct("<24sQQ")
+_ALIGNMENT = 8
+
+INDEXED_FIELDS = ContactIndex.FIELDS
+_ROW_WIDTH = len(_CONTACT_FIELDS)
+
+
+def _name_index_key(first_name, last_name):
+    return "\x00".join(_name_key(first_name, last_name))
+
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _native(view, typecode):
+    """
+    Reads a little-endian section as an array of `typecode` integers: in
+    place on little-endian hosts, as a byte-swapped copy on big-endian ones.
+    """
+    if sys.byteorder == "big":
+        values = array(typecode)
+        values.frombytes(view)
+        values.byteswap()
+        return memoryview(values)
+    return view.cast(typecode)
+
+
+def write_snapshot(system, path):
+    """
+    Writes every address book of a system to a snapshot file.
+
+    The file is written under a temporary name and renamed into place, so
+    readers never see a partly written snapshot.
+
+    Args:
+        system (AddressBookSystem): The system to write.
+        path (str): The snapshot file.
+
+    Returns:
+        int: The number of contacts written.
+    """
+    string_ids = {}
+
+    def intern(value):
+        string_id = string_ids.get(value)
+        if string_id is None:
+            string_id = string_ids[value] = len(string_ids)
+        return string_id
+
+    books = array("I")
+    contacts = array("I")
+    groups = {field: defaultdict(list) for field in ("name", *INDEXED_FIELDS)}
+    counts = {field: defaultdict(int) for field in INDEXED_FIELDS}
+    row = 0
+    for book_name, book in system.books.items():
+        books.extend((intern(book_name), row, len(book.contacts)))
+        for contact in book.contacts:
+            contacts.extend(intern(getattr(contact, field)) for field in _CONTACT_FIELDS)
+            groups["name"][_name_index_key(contact.first_name, contact.last_name)].append(row)
+            for field in INDEXED_FIELDS:
+                value = getattr(contact, field)
+                groups[field][_normalize(value)].append(row)
+                counts[field][value] += 1
+            row += 1
+
+    sections = {"books": books, "contacts": contacts}
+    for field, field_groups in groups.items():
+        keys, starts, rows = array("I"), array("I", [0]), array("I")
+        for key in sorted(field_groups):
+            keys.append(intern(key))
+            rows.extend(field_groups[key])
+            starts.append(len(rows))
+        sections.update({f"{field}.keys": keys, f"{field}.starts": starts, f"{field}.rows": rows})
+    for field, field_counts in counts.items():
+        sections[f"{field}.values"] = array("I", map(intern, field_counts))
+        sections[f"{field}.counts"] = array("I", field_counts.values())
+
+    encoded = [value.encode() for value in string_ids]
+    offsets = array("Q", [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    blobs = {"strings.offsets": _little_endian(offsets), "strings.data": b"".join(encoded)}
+    blobs.update((name, _little_endian(values)) for name, values in sections.items())
+
+    directory = []
+    offset = _HEADER.size + _DIRECTORY_ENTRY.size * len(blobs)
+    for name, blob in blobs.items():
+        offset += -offset % _ALIGNMENT
+        directory.append((name, offset, len(blob)))
+        offset += len(blob)
+
+    temporary = f"{os.fspath(path)}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, len(books) // 3, row, len(string_ids), len(blobs)))
+        for name, offset, size in directory:
+            file.write(_DIRECTORY_ENTRY.pack(name.encode(), offset, size))
+        for (name, offset, size), blob in zip(directory, blobs.values()):
+            file.write(b"\x00" * (offset - file.tell()))
+            file.write(blob)
+    os.replace(temporary, path)
+    return row
+
+
+class MappedBook(Sequence):
+    """
+    The contacts of one address book in a MappedSnapshot, as a read-only
+    sequence. Each access decodes a new Contact.
+
+    Attributes:
+        name (str): The name of the address book.
+    """
+
+    def __init__(self, snapshot, name, first_row, count):
+        self._snapshot = snapshot
+        self.name = name
+        self._first = first_row
+        self._count = count
+
+    @property
+    def contacts(self):
+        return self
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("contact index out of range")
+        return self._snapshot._contact(self._first + i)
+
+    def __iter__(self):
+        for row in range(self._first, self._first + self._count):
+            yield self._snapshot._contact(row)
+
+    def find_contact(self, first_name, last_name):
+        """
+        Looks up a contact by first and last name (case-insensitive), using the
+        snapshot's name index.
+
+        Returns:
+            Contact or None: The matching contact, or None if not found.
+        """
+        for row in self._snapshot._rows("name", _name_index_key(first_name, last_name)):
+            if self._first <= row < self._first + self._count:
+                return self._snapshot._contact(row)
+        return None
+
+
+class MappedSnapshot:
+    """
+    A read-only view of a snapshot file written by `write_snapshot`.
+
+    Opening a snapshot only reads its header and book table; contacts are
+    decoded when accessed, and searches and counts use the indexes stored in
+    the file. On big-endian hosts the integer sections are copied and
+    byte-swapped when the snapshot is opened. Use it as a context manager, or
+    call `close()`.
+
+    Attributes:
+        books (dict): Maps each address book name to its MappedBook.
+    """
+
+    def __init__(self, path):
+        """
+        Maps a snapshot file.
+
+        Args:
+            path (str): The snapshot file.
+
+        Raises:
+            ValueError: If the file is not a snapshot of a supported version.
+        """
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            self._open(path)
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self, path):
+        magic, version, book_count, self.contact_count, _, section_count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a version {VERSION} address book snapshot.")
+        whole = self._view(memoryview(self._mmap))
+        self._sections = {}
+        for i in range(section_count):
+            name, offset, size = _DIRECTORY_ENTRY.unpack_from(self._mmap, _HEADER.size + i * _DIRECTORY_ENTRY.size)
+            name = name.rstrip(b"\x00").decode()
+            section = self._view(whole[offset:offset + size])
+            if name == "strings.offsets":
+                section = self._view(_native(section, "Q"))
+            elif name != "strings.data":
+                section = self._view(_native(section, "I"))
+            self._sections[name] = section
+        self._offsets = self._sections["strings.offsets"]
+        self._data = self._sections["strings.data"]
+        self._contacts = self._sections["contacts"]
+        table = self._sections["books"]
+        self.books = {}
+        self._book_starts = []
+        for i in range(book_count):
+            name_id, first, count = table[3 * i:3 * i + 3]
+            book = MappedBook(self, self._string(name_id), first, count)
+            self.books[book.name] = book
+            self._book_starts.append(first)
+        self._book_list = list(self.books.values())
+
+    def _view(self, view):
+        self._views.append(view)
+        return view
+
+    def close(self):
+        """
+        Unmaps the file. Contacts already decoded stay valid.
+        """
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.contact_count
+
+    # Decoding
+    def _string(self, string_id):
+        return str(self._data[self._offsets[string_id]:self._offsets[string_id + 1]], "utf-8")
+
+    def _contact(self, row):
+        ids = self._contacts[row * _ROW_WIDTH:(row + 1) * _ROW_WIDTH]
+        return Contact.from_trusted({field: self._string(string_id) for field, string_id in zip(_CONTACT_FIELDS, ids)})
+
+    def _book_of(self, row):
+        return self._book_list[bisect_right(self._book_starts, row) - 1]
+
+    def _rows(self, field, key):
+        """
+        Returns the rows stored under a normalized key in a field's index.
+        """
+        keys = self._sections[f"{field}.keys"]
+        lo, hi = 0, len(keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._string(keys[mid]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(keys) or self._string(keys[lo]) != key:
+            return []
+        starts = self._sections[f"{field}.starts"]
+        return self._sections[f"{field}.rows"][starts[lo]:starts[lo + 1]].tolist()
+
+    # Queries
+    def get_address_book(self, name):
+        return self.books.get(name)
+
+    def search(self, field, value):
+        """
+        Finds contacts whose `field` matches `value` case-insensitively.
+
+        Args:
+            field (str): One of "city", "state" or "zip_code".
+            value (str): The value to look up.
+
+        Returns:
+            list: A list of tuples (book_name, contact) for matches.
+        """
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Cannot search by '{field}'. Choose one of {', '.join(INDEXED_FIELDS)}.")
+        return [(self._book_of(row).name, self._contact(row)) for row in self._rows(field, _normalize(value))]
+
+    def count_by(self, field):
+        """
+        Counts contacts per exact value of a field.
+
+        Args:
+            field (str): One of "city", "state" or "zip_code".
+
+        Returns:
+            dict: A dictionary mapping each value to its contact count.
+        """
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Cannot count by '{field}'. Choose one of {', '.join(INDEXED_FIELDS)}.")
+        values, counts = self._sections[f"{field}.values"], self._sections[f"{field}.counts"]
+        return {self._string(value): count for value, count in zip(values, counts)}
+
+    def search_by_city(self, city):
+        return self.search("city", city)
+
+    def search_by_state(self, state):
+        return self.search("state", state)
+
+    def search_by_zip(self, zip_code):
+        return self.search("zip_code", zip_code)
+
+    def count_by_city(self):
+        return self.count_by("city")
+
+    def count_by_state(self):
+        return self.count_by("state")
+
+    def count_by_zip(self):
+        return self.count_by("zip_code")
+
+    def load_system(self, book_factory=AddressBook):
+        """
+        Decodes the whole snapshot into a new, editable AddressBookSystem.
+
+        Args:
+            book_factory (type): The AddressBook class used for the books.
+
+        Returns:
+            AddressBookSystem: The system.
+        """
+        system = AddressBookSystem(book_factory=book_factory)
+        for name, book in self.books.items():
+            system.add_address_book(name)
+            system.books[name]._insert_many(list(book))
+        return system
@@ -0,0 +1,308 @@
+"""
+sqlite_storage.py
+
+Persistent SQLite storage backend for the Address Book System.
+
+An SQLiteStorage is passed to AddressBookSystem(storage=...). It observes every
+address book and writes each change to the database in batched transactions,
+loads an address book's contacts only when that book is first accessed, and
+answers the system-wide search and count queries with indexed SQL.
+
+Classes:
+- SQLiteStorage: The storage backend.
+"""
+
+import sqlite3
+
+from address_book_system import _CONTACT_FIELDS, AddressBookObserver, Contact, _name_key, _normalize
+
+# Contact fields searchable through an indexed, case-folded key column.
+KEYED_FIELDS = ("city", "state", "zip_code")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS contacts (
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    first_key TEXT NOT NULL,
+    last_key TEXT NOT NULL,
+    city_key TEXT NOT NULL,
+    state_key TEXT NOT NULL,
+    zip_code_key TEXT NOT NULL,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    address TEXT NOT NULL,
+    city TEXT NOT NULL,
+    state TEXT NOT NULL,
+    zip_code TEXT NOT NULL,
+    phone_number TEXT NOT NULL,
+    email TEXT NOT NULL,
+    UNIQUE (book_id, first_key, last_key)
+);
+CREATE INDEX IF NOT EXISTS contacts_name ON contacts (first_key, last_key);
+CREATE INDEX IF NOT EXISTS contacts_city ON contacts (city_key);
+CREATE INDEX IF NOT EXISTS contacts_state ON contacts (state_key);
+CREATE INDEX IF NOT EXISTS contacts_zip_code ON contacts (zip_code_key);
+"""
+
+_INSERT_CONTACT = (
+    "INSERT INTO contacts (book_id, first_key, last_key, city_key, state_key, zip_code_key, "
+    f"{', '.join(_CONTACT_FIELDS)}) VALUES ({', '.join('?' * (6 + len(_CONTACT_FIELDS)))})"
+)
+_SELECT_FIELDS = ", ".join(f"contacts.{field}" for field in _CONTACT_FIELDS)
+
+
+class SQLiteStorage(AddressBookObserver):
+    """
+    Stores address books and their contacts in an SQLite database.
+
+    Writes are buffered and committed every `batch_size` changes, and whenever
+    a query needs to see them. Call `flush()` or `close()` (or use the storage
+    as a context manager) to make sure the last batch is committed.
+
+    Attributes:
+        connection (sqlite3.Connection): The open database connection.
+        batch_size (int): The number of changes committed per transaction.
+    """
+
+    def __init__(self, path, batch_size=1000):
+        """
+        Opens (and if needed creates) the database at `path` in WAL mode.
+
+        Args:
+            path (str): The database file, or ":memory:".
+            batch_size (int): The number of changes committed per transaction.
+        """
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(_SCHEMA)
+        self.batch_size = batch_size
+        self._book_ids = dict(self.connection.execute("SELECT name, id FROM books"))
+        self._pending_inserts = []
+        self._pending_changes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Writes
+    def _changed(self, count=1):
+        """
+        Counts uncommitted changes and commits once a full batch is pending.
+
+        Args:
+            count (int): The number of changes just made.
+        """
+        self._pending_changes += count
+        if self._pending_changes >= self.batch_size:
+            self.flush()
+
+    def _flush_inserts(self):
+        """
+        Writes the buffered contact inserts with a single executemany call.
+        """
+        if self._pending_inserts:
+            self.connection.executemany(_INSERT_CONTACT, self._pending_inserts)
+            self._pending_inserts = []
+
+    def flush(self):
+        """
+        Writes buffered inserts and commits the current transaction.
+        """
+        self._flush_inserts()
+        self.connection.commit()
+        self._pending_changes = 0
+
+    def close(self):
+        """
+        Commits pending changes and closes the connection.
+        """
+        self.flush()
+        self.connection.close()
+
+    def book_added(self, book_name):
+        if book_name not in self._book_ids:
+            cursor = self.connection.execute("INSERT INTO books (name) VALUES (?)", (book_name,))
+            self._book_ids[book_name] = cursor.lastrowid
+            self._changed()
+
+    def delete_book(self, book_name):
+        """
+        Deletes an address book and all of its contacts.
+
+        Args:
+            book_name (str): The name of the address book.
+        """
+        book_id = self._book_ids.pop(book_name, None)
+        if book_id is not None:
+            self._flush_inserts()
+            self.connection.execute("DELETE FROM books WHERE id = ?", (book_id,))
+            self._changed()
+
+    def contact_added(self, book_name, contact):
+        self._pending_inserts.append(
+            (self._book_ids[book_name], *_name_key(contact.first_name, contact.last_name),
+             *(_normalize(getattr(contact, field)) for field in KEYED_FIELDS),
+             *(getattr(contact, field) for field in _CONTACT_FIELDS))
+        )
+        self._changed()
+
+    def contact_removed(self, book_name, contact):
+        self._flush_inserts()
+        self.connection.execute(
+            "DELETE FROM contacts WHERE book_id = ? AND first_key = ? AND last_key = ?",
+            (self._book_ids[book_name], *_name_key(contact.first_name, contact.last_name)),
+        )
+        self._changed()
+
+    def contact_updated(self, book_name, contact, old_values):
+        self._flush_inserts()
+        old_key = _name_key(old_values.get("first_name", contact.first_name),
+                            old_values.get("last_name", contact.last_name))
+        assignments = ", ".join(f"{column} = ?" for column in
+                                ("first_key", "last_key", *(f"{f}_key" for f in KEYED_FIELDS), *_CONTACT_FIELDS))
+        self.connection.execute(
+            f"UPDATE contacts SET {assignments} WHERE book_id = ? AND first_key = ? AND last_key = ?",
+            (*_name_key(contact.first_name, contact.last_name),
+             *(_normalize(getattr(contact, field)) for field in KEYED_FIELDS),
+             *(getattr(contact, field) for field in _CONTACT_FIELDS),
+             self._book_ids[book_name], *old_key),
+        )
+        self._changed()
+
+    # Reads
+    def book_names(self):
+        """
+        Returns:
+            list: The names of all stored address books, in creation order.
+        """
+        return list(self._book_ids)
+
+    def load_contacts(self, book_name):
+        """
+        Loads the contacts of one address book, in insertion order.
+
+        The rows were validated before they were stored, so contacts are built
+        without validating them again.
+
+        Args:
+            book_name (str): The name of the address book.
+
+        Yields:
+            Contact: The next stored contact.
+        """
+        self._flush_inserts()
+        rows = self.connection.execute(
+            f"SELECT {_SELECT_FIELDS} FROM contacts WHERE book_id = ? ORDER BY rowid",
+            (self._book_ids[book_name],),
+        )
+        for row in rows:
+            yield Contact.model_construct(**dict(zip(_CONTACT_FIELDS, row)))
+
+    def search(self, field, value):
+        """
+        Finds contacts whose `field` matches `value` case-insensitively,
+        using the index on the field's key column.
+
+        Args:
+            field (str): One of KEYED_FIELDS.
+            value (str): The value to look up.
+
+        Returns:
+            list: (book_name, fields) tuples, where fields is a dict of Contact fields.
+        """
+        return list(self.iter_search(field, value))
+
+    def iter_search(self, field, value):
+        """
+        Iterates over the contacts whose `field` matches `value`
+        case-insensitively, reading rows only as they are reached.
+
+        Args:
+            field (str): One of KEYED_FIELDS.
+            value (str): The value to look up.
+
+        Yields:
+            tuple: (book_name, fields), where fields is a dict of Contact fields.
+        """
+        if field not in KEYED_FIELDS:
+            raise ValueError(f"Cannot search stored contacts by '{field}'.")
+        self._flush_inserts()
+        rows = self.connection.execute(
+            f"SELECT books.name, {_SELECT_FIELDS} FROM contacts JOIN books ON books.id = contacts.book_id "
+            f"WHERE contacts.{field}_key = ? ORDER BY contacts.rowid",
+            (_normalize(value),),
+        )
+        for row in rows:
+            yield row[0], dict(zip(_CONTACT_FIELDS, row[1:]))
+
+    def iter_all(self, order_by=None):
+        """
+        Iterates over every stored contact.
+
+        Args:
+            order_by (str, optional): A Contact field to order the contacts by.
+
+        Yields:
+            tuple: (book_name, fields), where fields is a dict of Contact fields.
+        """
+        if order_by is not None and order_by not in _CONTACT_FIELDS:
+            raise ValueError(f"Cannot order stored contacts by '{order_by}'.")
+        self._flush_inserts()
+        rows = self.connection.execute(
+            f"SELECT books.name, {_SELECT_FIELDS} FROM contacts JOIN books ON books.id = contacts.book_id "
+            f"ORDER BY {f'contacts.{order_by}, ' if order_by else ''}contacts.rowid"
+        )
+        for row in rows:
+            yield row[0], dict(zip(_CONTACT_FIELDS, row[1:]))
+
+    def count(self, field=None, value=None, book_names=None):
+        """
+        Counts the stored contacts, or those whose `field` matches `value`
+        case-insensitively, using the index on the field's key column.
+
+        Args:
+            field (str, optional): One of KEYED_FIELDS.
+            value (str, optional): The value to look up.
+            book_names (iterable, optional): Only count the contacts of these
+                books; all books if None.
+
+        Returns:
+            int: The number of contacts.
+        """
+        if field is not None and field not in KEYED_FIELDS:
+            raise ValueError(f"Cannot count stored contacts by '{field}'.")
+        self._flush_inserts()
+        conditions, parameters = [], []
+        if field is not None:
+            conditions.append(f"{field}_key = ?")
+            parameters.append(_normalize(value))
+        if book_names is not None:
+            book_ids = [self._book_ids[name] for name in book_names if name in self._book_ids]
+            conditions.append(f"book_id IN ({', '.join('?' * len(book_ids))})")
+            parameters.extend(book_ids)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.connection.execute(f"SELECT COUNT(*) FROM contacts{where}", parameters).fetchone()[0]
+
+    def count_by(self, field):
+        """
+        Counts stored contacts per exact value of a field.
+
+        Args:
+            field (str): One of KEYED_FIELDS.
+
+        Returns:
+            dict: A dictionary mapping each value to its contact count.
+        """
+        if field not in KEYED_FIELDS:
+            raise ValueError(f"Cannot count stored contacts by '{field}'.")
+        self._flush_inserts()
+        return dict(self.connection.execute(
+            f"SELECT {field}, COUNT(*) FROM contacts GROUP BY {field} ORDER BY MIN(rowid)"
+        ))
@@ -244,3 +244,1115 @@ def test_json_export_and_import(tmp_path):
     assert len(new_book.contacts) == 1
     assert new_book.contacts[0].first_name == "Kunal"
     assert new_book.contacts[0].city == "Lucknow"
+
+def make_contact(first="Asha", last="Nair", city="Kochi", state="Kerala", zip_code="682001", **overrides):
+    fields = dict(first_name=first, last_name=last, address="12 Beach Rd", city=city, state=state,
+                  zip_code=zip_code, phone_number="+91 9876543210", email=f"{first.lower()}@mail.com")
+    fields.update(overrides)
+    return Contact(**fields)
+
+@pytest.mark.usecase16
+def test_name_index_lookup_and_duplicates():
+    ab = AddressBook()
+    assert ab.add_contact(make_contact("Asha", "Nair")) is True
+    assert ab.add_contact(make_contact("ASHA", "nair")) is False
+    assert ab.find_contact("asha", "NAIR").first_name == "Asha"
+    assert ab.find_contact("Ravi", "Nair") is None
+
+@pytest.mark.usecase16
+def test_name_index_follows_edit_and_delete():
+    ab = AddressBook()
+    for first in ["Asha", "Bina", "Chitra"]:
+        ab.add_contact(make_contact(first, "Nair"))
+
+    ab.edit_contact_by_name("Bina", "Nair", {"first_name": "Divya", "city": "Thrissur"})
+    assert ab.find_contact("Bina", "Nair") is None
+    assert ab.find_contact("Divya", "Nair").city == "Thrissur"
+
+    with pytest.raises(ValueError):
+        ab.edit_contact_by_name("Divya", "Nair", {"first_name": "Asha"})
+
+    assert ab.delete_contact_by_name("asha", "nair").first_name == "Asha"
+    assert ab.delete_contact_by_name("Asha", "Nair") is None
+    assert sorted(c.first_name for c in ab.contacts) == ["Chitra", "Divya"]
+    assert ab.find_contact("Chitra", "Nair").first_name == "Chitra"
+    assert ab.find_contact("Divya", "Nair").first_name == "Divya"
+
+@pytest.mark.usecase16
+def test_delete_keeps_insertion_order():
+    ab = AddressBook()
+    for first in ["Abe", "Bob", "Cal", "Dan"]:
+        ab.add_contact(make_contact(first, "Nair"))
+    ab.delete_contact_by_name("Bob", "Nair")
+    assert [c.first_name for c in ab.contacts] == ["Abe", "Cal", "Dan"]
+    ab.edit_contact_by_name("Abe", "Nair", {"first_name": "Ada"})
+    ab.add_contact(make_contact("Eve", "Nair"))
+    ab.delete_contact_by_name("Dan", "Nair")
+    assert [c.first_name for c in ab.contacts] == ["Ada", "Cal", "Eve"]
+    assert ab.list_page(cursor=1, page_size=1) == ([ab.find_contact("Cal", "Nair")], 2)
+
+@pytest.mark.usecase17
+def test_system_indexes_follow_add_edit_delete():
+    system = AddressBookSystem()
+    system.add_address_book("Home")
+    system.add_address_book("Work")
+    home = system.get_address_book("Home")
+    work = system.get_address_book("Work")
+
+    home.add_contact(make_contact("Asha", "Nair", city="Kochi", state="Kerala", zip_code="682001"))
+    work.add_contact(make_contact("Bina", "Rao", city="kochi", state="Kerala", zip_code="682002"))
+    work.add_contact(make_contact("Chitra", "Iyer", city="Chennai", state="TN", zip_code="600001"))
+
+    assert [(b, c.first_name) for b, c in system.search_by_city("KOCHI")] == [("Home", "Asha"), ("Work", "Bina")]
+    assert system.count_by_state()["Kerala"] == 2
+
+    work.edit_contact_by_name("Bina", "Rao", {"city": "Chennai", "state": "TN"})
+    assert [c.first_name for _, c in system.search_by_city("Kochi")] == ["Asha"]
+    assert system.count_by_city() == {"Kochi": 1, "Chennai": 2}
+    assert len(system.view_all_grouped_by_state()["TN"]) == 2
+
+    work.delete_contact_by_name("Chitra", "Iyer")
+    assert [c.first_name for _, c in system.search_by_city("chennai")] == ["Bina"]
+    assert system.count_by_state() == {"Kerala": 1, "TN": 1}
+    assert [c.first_name for _, c in system.search_by_zip("682001")] == ["Asha"]
+
+@pytest.mark.usecase17
+def test_system_indexes_keep_a_contact_shared_by_two_books():
+    system = AddressBookSystem()
+    system.add_address_book("Work")
+    system.add_address_book("Home")
+    shared = make_contact("Asha", "Nair", city="Pune")
+    system.get_address_book("Work").add_contact(shared)
+    system.get_address_book("Home").add_contact(shared)
+
+    assert [b for b, _ in system.search_by_city("pune")] == ["Work", "Home"]
+    assert system.count_by_city() == {"Pune": 2}
+
+    system.get_address_book("Work").delete_contact_by_name("Asha", "Nair")
+    assert [b for b, _ in system.search_by_city("pune")] == ["Home"]
+    system.get_address_book("Home").delete_contact_by_name("Asha", "Nair")
+    assert system.search_by_city("pune") == [] and system.count_by_city() == {}
+
+@pytest.mark.usecase18
+def test_streaming_csv_import_reports_bad_rows(tmp_path):
+    csv_file = tmp_path / "feed.csv"
+    header = "first_name,last_name,address,city,state,zip_code,phone_number,email\n"
+    rows = [f"Name{chr(65 + i % 26)}{chr(65 + i // 26)},Rao,{i} Main Rd,Pune,MH,411001,+91 9000000000,r{i}@mail.com\n"
+            for i in range(25)]
+    rows[3] = "Bad1,Rao,1 Main Rd,Pune,MH,411001,+91 9000000000,bad@mail.com\n"
+    rows[17] = "Good,Rao,1 Main Rd,Pune,MH,41,+91 9000000000,not-an-email\n"
+    rows.append(rows[0])
+    csv_file.write_text(header + "".join(rows))
+
+    book = AddressBook()
+    report = book.import_from_csv(csv_file, chunk_size=4)
+
+    assert report.rows == 26
+    assert report.imported == 23
+    assert report.duplicates == 1
+    assert report.error_count == 2
+    assert [row for row, _ in report.errors] == [4, 18]
+    assert "zip_code" in report.errors[1][1] and "email" in report.errors[1][1]
+    assert len(book.contacts) == 23
+
+@pytest.mark.usecase19
+def test_ndjson_append_export_and_streaming_import(tmp_path):
+    ndjson_file = tmp_path / "contacts.ndjson"
+    first = AddressBook()
+    first.add_contact(make_contact("Asha", "Nair"))
+    first.export_to_ndjson(ndjson_file)
+    second = AddressBook()
+    second.add_contact(make_contact("Bina", "Rao"))
+    second.export_to_ndjson(ndjson_file, append=True)
+    with open(ndjson_file, "a") as file:
+        file.write("\n{not json}\n")
+
+    lines = ndjson_file.read_text().splitlines()
+    assert len(lines) == 4 and '"first_name":"Bina"' in lines[1]
+
+    merged = AddressBook()
+    report = merged.import_from_ndjson(ndjson_file)
+    assert report.imported == 2
+    assert report.error_count == 1
+    assert merged.find_contact("Bina", "Rao").email == "bina@mail.com"
+
+@pytest.mark.usecase20
+def test_system_txt_round_trip(tmp_path):
+    system = AddressBookSystem()
+    system.add_address_book("Home")
+    system.add_address_book("Work")
+    system.get_address_book("Home").add_contact(make_contact("Asha", "Nair", address="Flat 2, 7 MG Rd"))
+    system.get_address_book("Home").add_contact(make_contact("Bina", "Nair", address="Flat 2, 7 MG Rd"))
+    system.get_address_book("Work").add_contact(make_contact("Chitra", "Iyer", city="Chennai", state="Tamil Nadu"))
+
+    txt_file = tmp_path / "all.txt"
+    system.export_all_to_txt(txt_file)
+
+    restored = AddressBookSystem()
+    report = restored.import_all_from_txt(txt_file)
+
+    assert report.imported == 3 and report.error_count == 0
+    assert list(restored.books) == ["Home", "Work"]
+    asha = restored.get_address_book("Home").find_contact("Asha", "Nair")
+    assert asha.address == "Flat 2, 7 MG Rd"
+    assert restored.get_address_book("Home").find_contact("Bina", "Nair") is not None
+    assert restored.search_by_state("tamil nadu")[0][1].city == "Chennai"
+    assert str(asha) == str(system.get_address_book("Home").find_contact("Asha", "Nair"))
+
+@pytest.mark.usecase21
+def test_sqlite_storage_persists_and_pushes_down_queries(tmp_path):
+    from sqlite_storage import SQLiteStorage
+
+    db = tmp_path / "book.db"
+    with SQLiteStorage(db, batch_size=2) as storage:
+        system = AddressBookSystem(storage=storage)
+        system.add_address_book("Home")
+        system.add_address_book("Work")
+        home = system.get_address_book("Home")
+        home.add_contact(make_contact("Asha", "Nair", city="Kochi", state="Kerala"))
+        home.add_contact(make_contact("Bina", "Nair", city="Kochi", state="Kerala"))
+        system.get_address_book("Work").add_contact(make_contact("Chitra", "Iyer", city="Chennai", state="TN"))
+        home.edit_contact_by_name("Bina", "Nair", {"first_name": "Divya", "city": "Chennai"})
+        home.delete_contact_by_name("Asha", "Nair")
+
+    with SQLiteStorage(db) as storage:
+        system = AddressBookSystem(storage=storage)
+        assert list(system.books) == ["Home", "Work"]
+        assert system.books.loaded == {}
+
+        results = system.search_by_city("CHENNAI")
+        assert sorted((b, c.first_name) for b, c in results) == [("Home", "Divya"), ("Work", "Chitra")]
+        assert system.count_by_state() == {"TN": 1, "Kerala": 1}
+        assert system.books.loaded == {}
+
+        home = system.get_address_book("Home")
+        assert [c.first_name for c in home.contacts] == ["Divya"]
+        assert dict(system.search_by_city("chennai"))["Home"] is home.contacts[0]
+        assert sorted(system.view_all_grouped_by_city()) == ["Chennai"]
+
+@pytest.mark.usecase22
+def test_columnar_book_matches_address_book_behaviour():
+    from columnar_store import ColumnarAddressBook
+
+    system = AddressBookSystem(book_factory=ColumnarAddressBook)
+    system.add_address_book("Home")
+    system.add_address_book("Work")
+    home = system.get_address_book("Home")
+    assert home.add_contact(make_contact("Zara", "Ali", city="Pune", state="MH", zip_code="411001"))
+    assert home.add_contact(make_contact("Amit", "Bose", city="delhi", state="DL", zip_code="110001"))
+    assert home.add_contact(make_contact("Amit", "Aaron", city="Agra", state="UP", zip_code="282001"))
+    assert not home.add_contact(make_contact("AMIT", "bose"))
+    system.get_address_book("Work").add_contact(make_contact("Ravi", "Das", city="Delhi", state="DL", zip_code="110002"))
+
+    assert [(c.first_name, c.last_name) for c in home.sort_by_name()] == [("Amit", "Aaron"), ("Amit", "Bose"), ("Zara", "Ali")]
+    assert [c.city for c in home.sort_by_city()] == ["Agra", "delhi", "Pune"]
+    assert [b for b, _ in system.search_by_city("DELHI")] == ["Home", "Work"]
+    assert system.count_by_state() == {"MH": 1, "DL": 2, "UP": 1}
+
+    home.edit_contact_by_name("Amit", "Bose", {"last_name": "Sen", "address": "New Block 9"})
+    assert home.find_contact("amit", "sen").address == "New Block 9"
+    assert home.find_contact("Amit", "Bose") is None
+    assert home.delete_contact_by_name("Zara", "Ali").city == "Pune"
+    assert [c.first_name + c.last_name for c in home.contacts] == ["AmitSen", "AmitAaron"]
+    assert system.count_by_city() == {"delhi": 1, "Agra": 1, "Delhi": 1}
+    assert "Amit Sen" in home.list_contacts()[0]
+
+@pytest.mark.usecase22
+def test_columnar_delete_keeps_insertion_order(tmp_path):
+    from columnar_store import ColumnarAddressBook
+
+    book = ColumnarAddressBook()
+    names = ["Asha", "Bina", "Chitra", "Devi", "Esha", "Farah"]
+    for name in names:
+        book.add_contact(make_contact(name, city="Pune" if name < "D" else "Kochi"))
+    book.delete_contact_by_name("Bina", "Nair")
+    assert [c.first_name for c in book.contacts] == ["Asha", "Chitra", "Devi", "Esha", "Farah"]
+    assert book.contacts[1].first_name == "Chitra" and len(book.contacts) == 5
+    assert [c.first_name for _, c in book.search_by_city("pune")] == ["Asha", "Chitra"]
+    assert book.count_by_city() == {"Pune": 2, "Kochi": 3}
+
+    book.delete_contact_by_name("Asha", "Nair")
+    book.delete_contact_by_name("Esha", "Nair")
+    book.delete_contact_by_name("Devi", "Nair")
+    book.add_contact(make_contact("Gita"))
+    assert [c.first_name for c in book.contacts] == ["Chitra", "Farah", "Gita"]
+    assert book.find_contact("farah", "nair").first_name == "Farah"
+    assert [c.first_name for c in book.sort_by_name()] == ["Chitra", "Farah", "Gita"]
+    book.export_to_csv(tmp_path / "book.csv")
+    copy = AddressBook()
+    copy.import_from_csv(tmp_path / "book.csv")
+    assert [c.first_name for c in copy.contacts] == ["Chitra", "Farah", "Gita"]
+
+@pytest.mark.usecase23
+def test_vectorized_analytics_matches_counts():
+    pytest.importorskip("numpy")
+    from columnar_store import ColumnarAddressBook
+
+    system = AddressBookSystem()
+    system.add_address_book("Home")
+    system.add_address_book("Work")
+    system.get_address_book("Home").add_contact(make_contact("Asha", "Nair", city="Kochi", state="Kerala"))
+    system.get_address_book("Home").add_contact(make_contact("Bina", "Nair", city="Kochi", state="Kerala"))
+    system.get_address_book("Work").add_contact(make_contact("Ravi", "Das", city="Pune", state="MH"))
+    system.books["Columns"] = ColumnarAddressBook("Columns")
+    system.books["Columns"].add_contact(make_contact("Tara", "Sen", city="Kochi", state="Kerala"))
+
+    stats = system.analytics()
+    assert stats.count_by("city") == {"Kochi": 3, "Pune": 1}
+    assert stats.top_k("state", 1) == [("Kerala", 3)]
+    rows, columns, counts = stats.crosstab("state", "book")
+    assert list(rows) == ["Kerala", "MH"] and list(columns) == ["Home", "Work", "Columns"]
+    assert counts.tolist() == [[2, 0, 1], [0, 1, 0]]
+    assert [c.first_name for _, c in stats.entries(stats.group_by("city")["Pune"])] == ["Ravi"]
+
+    system.get_address_book("Work").edit_contact_by_name("Ravi", "Das", {"city": "Kochi"})
+    assert system.analytics().count_by("city") == {"Kochi": 4}
+
+@pytest.mark.usecase24
+def test_sort_orders_are_maintained_across_changes():
+    ab = AddressBook()
+    for first, city in [("Meera", "Pune"), ("Anil", "Agra"), ("Zoya", "Delhi")]:
+        ab.add_contact(make_contact(first, "Shah", city=city))
+
+    assert [c.first_name for c in ab.get_sorted_contacts()] == ["Anil", "Meera", "Zoya"]
+    assert [c.city for c in ab.sort_by_city()] == ["Agra", "Delhi", "Pune"]
+
+    ab.add_contact(make_contact("Bela", "Shah", city="Bhopal"))
+    ab.edit_contact_by_name("Zoya", "Shah", {"first_name": "Adah", "city": "Zirakpur"})
+    ab.delete_contact_by_name("Meera", "Shah")
+
+    assert [c.first_name for c in ab.sort_by_name()] == ["Adah", "Anil", "Bela"]
+    assert [c.city for c in ab.sort_by_city()] == ["Agra", "Bhopal", "Zirakpur"]
+    assert [c.first_name for c in ab.iter_sorted("city", offset=1, limit=5)] == ["Bela", "Adah"]
+    assert [c.first_name for c in ab.iter_sorted("name", limit=1)] == ["Adah"]
+
+@pytest.mark.usecase24
+def test_columnar_iter_sorted_pages():
+    from columnar_store import ColumnarAddressBook
+
+    book = ColumnarAddressBook()
+    for first, zip_code in [("Meera", "400001"), ("Anil", "110001"), ("Zoya", "282001")]:
+        book.add_contact(make_contact(first, "Shah", zip_code=zip_code))
+    assert [c.zip_code for c in book.iter_sorted("zip", offset=1)] == ["282001", "400001"]
+    book.edit_contact_by_name("Anil", "Shah", {"zip_code": "999999"})
+    assert [c.first_name for c in book.sort_by_zip()] == ["Zoya", "Meera", "Anil"]
+
+@pytest.mark.usecase25
+def test_type_ahead_prefix_and_fuzzy_search():
+    system = AddressBookSystem()
+    system.add_address_book("Home")
+    home = system.get_address_book("Home")
+    home.add_contact(make_contact("Priya", "Singh", city="Bengaluru", email="priya@example.com"))
+    home.add_contact(make_contact("Pritam", "Das", city="Bhopal", email="pritam@mail.com"))
+    home.add_contact(make_contact("Ravi", "Pillai", city="Kochi", email="ravi@example.com"))
+
+    assert [c.first_name for _, c in system.suggest("pri")] == ["Pritam", "Priya"]
+    assert [c.first_name for _, c in system.suggest("sin")] == ["Priya"]
+    assert [c.first_name for _, c in system.suggest("prya sin")][0] == "Priya"
+    assert [c.city for _, c in system.suggest("bengalru", field="city")] == ["Bengaluru"]
+    assert {c.first_name for _, c in system.suggest("example", field="email_domain")} == {"Priya", "Ravi"}
+
+    home.edit_contact_by_name("Pritam", "Das", {"first_name": "Kiran"})
+    home.add_contact(make_contact("Prem", "Nath"))
+    assert [c.first_name for _, c in system.suggest("pr")] == ["Prem", "Priya"]
+    home.delete_contact_by_name("Priya", "Singh")
+    assert [c.first_name for _, c in system.suggest("pr", limit=5)] == ["Prem"]
+
+@pytest.mark.usecase26
+def test_trusted_reload_of_checksummed_exports(tmp_path):
+    ab = AddressBook()
+    for i in range(5):
+        ab.add_contact(make_contact(first=f"Asha{'abcde'[i]}"))
+    csv_file = tmp_path / "contacts.csv"
+    json_file = tmp_path / "contacts.json"
+    ab.export_to_csv(csv_file)
+    ab.export_to_json(json_file)
+    assert (tmp_path / "contacts.csv.sha256").exists()
+
+    for path, load in ((csv_file, "import_from_csv"), (json_file, "import_from_json")):
+        copy = AddressBook()
+        report = getattr(copy, load)(path, trusted=True)
+        assert report.trusted and report.imported == 5
+        assert [c.model_dump() for c in copy.contacts] == [c.model_dump() for c in ab.contacts]
+
+    # A file changed after export is validated again, so bad rows are still caught.
+    with open(csv_file, "a") as file:
+        file.write("Bad,Row,x,y,z,1,123,not-an-email\n")
+    copy = AddressBook()
+    report = copy.import_from_csv(csv_file, trusted=True)
+    assert not report.trusted
+    assert report.imported == 5 and report.error_count == 1
+    trusted = Contact.from_trusted(make_contact().model_dump())
+    trusted.city = "Thrissur"
+    assert trusted.model_dump() == make_contact(city="Thrissur").model_dump()
+
+@pytest.mark.usecase27
+def test_parallel_import_matches_serial_import(tmp_path):
+    from address_book_system import AddressBookObserver
+    from parallel_import import RANGES_PER_WORKER, import_csv_parallel, import_ndjson_parallel
+    csv_file = tmp_path / "feed.csv"
+    header = "first_name,last_name,address,city,state,zip_code,phone_number,email\n"
+    rows = [f"Name{chr(65 + i % 26)}{chr(65 + i // 26)},Rao,{i} Main Rd,Pune,MH,411001,+91 9000000000,r{i}@mail.com\n"
+            for i in range(60)]
+    rows[3] = "Bad1,Rao,1 Main Rd,Pune,MH,411001,+91 9000000000,bad@mail.com\n"
+    rows[47] = "Good,Rao,1 Main Rd,Pune,MH,41,+91 9000000000,r47@mail.com\n"
+    rows.append(rows[0])
+    csv_file.write_text(header + "".join(rows))
+
+    class Batches(AddressBookObserver):
+        def __init__(self):
+            self.sizes = []
+
+        def contact_added(self, book_name, contact):
+            self.sizes.append(1)
+
+        def contacts_added(self, book_name, contacts):
+            self.sizes.append(len(contacts))
+
+    serial, parallel = AddressBook(), AddressBook()
+    batches = Batches()
+    parallel.observers.append(batches)
+    expected = serial.import_from_csv(csv_file)
+    report = import_csv_parallel(parallel, csv_file, workers=2)
+    assert (report.rows, report.imported, report.duplicates) == (61, 58, 1)
+    assert sum(batches.sizes) == 58 and len(batches.sizes) <= 2 * RANGES_PER_WORKER
+    assert report.errors == expected.errors
+    assert [c.model_dump() for c in parallel.contacts] == [c.model_dump() for c in serial.contacts]
+
+    ndjson_file = tmp_path / "contacts.ndjson"
+    serial.export_to_ndjson(ndjson_file)
+    copy = AddressBook()
+    report = import_ndjson_parallel(copy, ndjson_file, workers=2)
+    assert report.imported == 58 and report.error_count == 0
+    assert [c.model_dump() for c in copy.contacts] == [c.model_dump() for c in serial.contacts]
+
+@pytest.mark.usecase28
+def test_benchmark_harness_smoke(tmp_path):
+    from benchmark import BENCHMARKS, STARTUP_BENCHMARKS, compare_results, generate_contacts, main, run_benchmarks
+    contacts = generate_contacts(200)
+    assert len({(c.first_name, c.last_name) for c in contacts}) == 200
+    Contact(**contacts[-1].model_dump())
+
+    assert {"export_all_to_txt", "import_all_from_txt"} <= set(BENCHMARKS)
+    results = run_benchmarks(sizes=[50], repeat=1)
+    assert set(results["results"]) == {f"{name}[50]" for name in BENCHMARKS} | set(STARTUP_BENCHMARKS)
+
+    slower = {"results": {key: dict(r, seconds=r["seconds"] * 2 + 0.01) for key, r in results["results"].items()}}
+    assert len(compare_results(results, slower, threshold=0.5)) == len(BENCHMARKS) + len(STARTUP_BENCHMARKS)
+    assert compare_results(slower, results) == []
+
+    output = tmp_path / "bench.json"
+    assert main(["--sizes", "20", "--repeat", "1", "--only", "add_contact", "sort_by_name",
+                 "--output", str(output)]) == 0
+    assert main(["--sizes", "20", "--repeat", "1", "--only", "add_contact",
+                 "--compare", str(output), "--threshold", "100"]) == 0
+
+@pytest.mark.usecase29
+def test_metrics_snapshot_and_prometheus_dump(tmp_path):
+    import metrics
+    book = AddressBook()
+    metrics.reset()
+    metrics.enable()
+    try:
+        book.add_contact(make_contact())
+        book.find_contact("asha", "nair")
+        book.find_contact("Nobody", "Here")
+        # Lookups made on the way by bulk changes and queries are not counted.
+        book.bulk_update({"first_name": "Asha", "last_name": "Nair"}, {"city": "Kochi"})
+        system = AddressBookSystem()
+        system.add_address_book("Work")
+        system.books["Work"]._insert(make_contact(city="Pune"))
+        system.bulk_update({"city": "Pune"}, {"state": "Goa"})
+        assert len(system.query(first_name="Asha", last_name="Nair").all()) == 1
+        with pytest.raises(ValueError):
+            book.edit_contact_by_name("Asha", "Nair", {"zip_code": "1"})
+        book.export_to_csv(tmp_path / "book.csv")
+        AddressBook().import_from_csv(tmp_path / "book.csv")
+    finally:
+        metrics.disable()
+    book.find_contact("Asha", "Nair")
+
+    stats = metrics.snapshot()
+    assert stats["AddressBook.add_contact"]["calls"] == 1
+    assert (stats["AddressBook.find_contact"]["hits"], stats["AddressBook.find_contact"]["misses"]) == (1, 1)
+    assert stats["AddressBook.edit_contact_by_name"]["errors"] == 1
+    assert stats["AddressBook.import_from_csv"]["rows"] == 1
+    assert stats["AddressBook.export_to_csv"]["rows_per_second"] > 0
+    assert stats["AddressBook.find_contact"]["latency"][-1] == (float("inf"), 2)
+
+    path = tmp_path / "metrics.prom"
+    metrics.write_prometheus(path)
+    text = path.read_text()
+    assert 'address_book_operation_seconds_count{operation="AddressBook.find_contact"} 2' in text
+    assert 'address_book_lookups_total{operation="AddressBook.find_contact",result="miss"} 1' in text
+    assert 'address_book_rows_total{operation="AddressBook.import_from_csv"} 1' in text
+    metrics.reset()
+
+@pytest.mark.usecase30
+def test_json_lines_service_over_localhost():
+    import asyncio
+    import json
+    from service import AddressBookService, ServiceClient
+
+    async def scenario():
+        service = AddressBookService(batch_size=8)
+        port = await service.start()
+        client = await ServiceClient.connect(port=port)
+        try:
+            await client.call("add_book", book="Work")
+            with pytest.raises(ValueError, match="already exists"):
+                await client.call("add_book", book="Work")
+            assert await client.call("add", book="Work", contact=make_contact().model_dump()) == {"added": True}
+            with pytest.raises(ValueError, match="zip_code"):
+                await client.call("add", book="Work", contact=make_contact(first="Bina", zip_code="1").model_dump())
+            report = await client.call("import", book="Work", contacts=[
+                make_contact(first=name, city="Pune", state="MH", zip_code="411001").model_dump()
+                for name in ("Chitra", "Devi", "Asha")])
+            assert (report["imported"], report["duplicates"]) == (2, 1)
+            edited = await client.call("edit", book="Work", first_name="devi", last_name="nair",
+                                       updates={"city": "Mumbai"})
+            assert edited["city"] == "Mumbai"
+
+            # Pipelined writes from one connection are batched and answered in order.
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            names = [f"Pipe{chr(65 + i)}" for i in range(20)]
+            writer.write(b"".join(json.dumps({"id": i, "op": "add", "book": "Work",
+                                              "contact": make_contact(first=name).model_dump()}).encode() + b"\n"
+                                  for i, name in enumerate(names)) + b"not json\n")
+            await writer.drain()
+            responses = [json.loads(await reader.readline()) for _ in range(21)]
+            assert [r["id"] for r in responses[:20]] == list(range(20))
+            assert all(r["ok"] for r in responses[:20])
+            assert responses[20] == {"id": None, "ok": False, "error": "Invalid JSON."}
+            writer.close()
+
+            # Many concurrent readers.
+            readers = [await ServiceClient.connect(port=port) for _ in range(5)]
+            results = await asyncio.gather(*(r.call("search", field="city", value="pune") for r in readers))
+            assert all([e["contact"]["first_name"] for e in result] == ["Chitra"] for result in results)
+            for r in readers:
+                await r.close()
+            assert await client.call("count", field="city") == {"Kochi": 21, "Pune": 1, "Mumbai": 1}
+            assert (await client.call("delete", book="Work", first_name="Asha", last_name="Nair"))["first_name"] == "Asha"
+            assert await client.call("get", book="Work", first_name="Asha", last_name="Nair") is None
+            with pytest.raises(ValueError, match="Unknown operation"):
+                await client.call("drop_everything")
+        finally:
+            await client.close()
+            await service.close()
+        return service
+
+    service = asyncio.run(scenario())
+    assert len(service.system.books["Work"].contacts) == 22
+
+@pytest.mark.usecase31
+def test_rwlock_readers_overlap_and_writers_exclude():
+    import threading
+    import time
+    from concurrency import RWLock
+
+    lock = RWLock()
+    active, peak = [0], [0]
+    guard = threading.Lock()
+    # Every reader waits inside the lock until all of them hold it, which is
+    # only possible if readers overlap; otherwise the barrier breaks.
+    all_reading = threading.Barrier(8, timeout=10)
+    broken = []
+
+    def read():
+        with lock.read:
+            with guard:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            try:
+                all_reading.wait()
+            except threading.BrokenBarrierError:
+                broken.append(True)
+            with guard:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not broken and peak[0] == 8
+
+    total = [0]
+
+    def write():
+        for _ in range(200):
+            with lock.write:
+                value = total[0]
+                time.sleep(0)
+                with lock.read:  # re-entrant while writing
+                    total[0] = value + 1
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert total[0] == 800
+
+@pytest.mark.usecase31
+def test_thread_safe_system_stress():
+    import threading
+    from benchmark import generate_contacts
+    from concurrency import ThreadSafeAddressBookSystem
+    from query import Prefix
+
+    system = ThreadSafeAddressBookSystem()
+    for name in ("A", "B"):
+        system.add_address_book(name)
+    contacts = generate_contacts(2000)
+    errors = []
+    done = threading.Event()
+
+    def writer(part):
+        try:
+            book = system.books["AB"[part % 2]]
+            mine = contacts[part::4]
+            for contact in mine:
+                assert book.add_contact(contact)
+            for contact in mine[::2]:
+                assert book.delete_contact_by_name(contact.first_name, contact.last_name)
+            for contact in mine[1::2][:50]:
+                book.edit_contact_by_name(contact.first_name, contact.last_name, {"city": "Agra"})
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            while not done.is_set():
+                system.search_by_city("Pune")
+                system.count_by_state()
+                system.view_all_grouped_by_city()
+                system.books["A"].sort_by_name()
+                list(system.books["B"].iter_sorted("zip", 0, 20))
+                system.query(Prefix("first_name", "a")).order_by("last_name").all()
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    writers = [threading.Thread(target=writer, args=(part,)) for part in range(4)]
+    for t in readers + writers:
+        t.start()
+    system.add_address_book("C")
+    suggestions = system.suggest("X")
+    for t in writers:
+        t.join()
+    done.set()
+    for t in readers:
+        t.join()
+
+    assert errors == []
+    assert suggestions
+    remaining = [c for book in system.books.values() for c in book.contacts]
+    assert len(remaining) == 1000
+    assert sum(system.count_by_city().values()) == 1000
+    assert system.count_by_city()["Agra"] == 200
+    assert len(system.search_by_city("agra")) == 200
+    assert sorted(c.first_name for c in system.books["A"].sort_by_name()) == \
+        sorted(c.first_name for c in system.books["A"].contacts)
+    assert len(system.suggest("Xb", limit=100)) > 0
+
+@pytest.mark.usecase32
+def test_write_ahead_log_recovery_and_compaction(tmp_path):
+    from wal import WriteAheadLog
+
+    def state(system):
+        return {name: sorted(c.model_dump()["first_name"] + c.city for c in book.contacts)
+                for name, book in system.books.items()}
+
+    wal = WriteAheadLog.open(tmp_path)
+    system = wal.system
+    system.add_address_book("Work")
+    work = system.books["Work"]
+    for name in ("Asha", "Bina", "Chitra"):
+        work.add_contact(make_contact(first=name))
+    work.edit_contact_by_name("Bina", "Nair", {"first_name": "Binu", "city": "Pune"})
+    work.delete_contact_by_name("Chitra", "Nair")
+    expected = state(system)
+    wal.close()
+
+    wal = WriteAheadLog.open(tmp_path, compact_every=2)
+    assert state(wal.system) == expected
+    assert wal.system.search_by_city("pune")[0][1].first_name == "Binu"
+    wal.system.add_address_book("Home")
+    home = wal.system.books["Home"]
+    home.add_contact(make_contact(first="Devi"))  # Second record: compacts.
+    assert (tmp_path / "snapshot.jsonl").exists() and (tmp_path / "wal.log").read_text() == ""
+    home.add_contact(make_contact(first="Esha"))
+    expected = state(wal.system)
+    seq = wal.seq
+    wal.close()
+
+    # A record torn by a crash is dropped, and logging resumes after the last good one.
+    with open(tmp_path / "wal.log", "a") as file:
+        file.write('[99,"a","Home",["Fa')
+    wal = WriteAheadLog.open(tmp_path)
+    assert state(wal.system) == expected and wal.seq == seq
+    assert wal.system.count_by_city() == {"Kochi": 3, "Pune": 1}
+    wal.system.books["Home"].delete_contact_by_name("Esha", "Nair")
+    wal.close()
+    wal = WriteAheadLog.open(tmp_path)
+    assert [c.first_name for c in wal.system.books["Home"].contacts] == ["Devi"]
+    wal.close()
+
+@pytest.mark.usecase32
+def test_write_ahead_log_compacts_outside_the_system_lock(tmp_path):
+    import json
+    import threading
+    from concurrency import ThreadSafeAddressBookSystem
+    from wal import WriteAheadLog
+
+    system = ThreadSafeAddressBookSystem()
+    wal = WriteAheadLog(tmp_path, system, compact_every=3)
+    system.add_observer(wal)
+    compacting = []
+    original = wal.compact
+    wal.compact = lambda: compacting.append(threading.current_thread()) or original()
+
+    system.add_address_book("Work")
+    names = [f"Asha{chr(97 + i)}" for i in range(7)]
+    for name in names:
+        system.books["Work"].add_contact(make_contact(first=name))
+    wal.close()
+    assert compacting and threading.current_thread() not in compacting
+    header = json.loads((tmp_path / "snapshot.jsonl").read_text().splitlines()[0])
+    assert header["version"] == 2 and header["seq"] <= wal.seq
+
+    recovered = WriteAheadLog.open(tmp_path)
+    assert [c.first_name for c in recovered.system.books["Work"].contacts] == names
+    assert recovered.seq == wal.seq
+    recovered.close()
+
+@pytest.mark.usecase33
+def test_mapped_snapshot_matches_system(tmp_path):
+    from snapshot import MappedSnapshot, write_snapshot
+
+    system = AddressBookSystem()
+    system.add_address_book("Work")
+    system.add_address_book("Home")
+    system.books["Work"].add_contact(make_contact("Asha", city="Pune", state="Maharashtra", zip_code="411001"))
+    system.books["Work"].add_contact(make_contact("Bina"))
+    system.books["Home"].add_contact(make_contact("Chitra", city="PUNE", state="Maharashtra", zip_code="411001"))
+    path = tmp_path / "system.snap"
+    assert write_snapshot(system, path) == 3
+
+    with MappedSnapshot(path) as snapshot:
+        assert list(snapshot.books) == ["Work", "Home"] and len(snapshot) == 3
+        work = snapshot.books["Work"]
+        assert [c.first_name for c in work] == ["Asha", "Bina"] and work[-1] == make_contact("Bina")
+        assert work.find_contact("BINA", "nair").city == "Kochi"
+        assert snapshot.books["Home"].find_contact("Asha", "Nair") is None
+        assert [(b, c.first_name) for b, c in snapshot.search_by_city("pune")] == [("Work", "Asha"), ("Home", "Chitra")]
+        assert snapshot.search_by_zip("000000") == []
+        assert snapshot.count_by_city() == system.count_by_city()
+        assert snapshot.count_by_state() == {"Maharashtra": 2, "Kerala": 1}
+        loaded = snapshot.load_system()
+    loaded.books["Home"].add_contact(make_contact("Devi"))
+    assert loaded.search_by_state("kerala")[-1][1].first_name == "Devi"
+
+    (tmp_path / "bad.snap").write_bytes(b"not a snapshot at all, not at all")
+    with pytest.raises(ValueError):
+        MappedSnapshot(tmp_path / "bad.snap")
+
+@pytest.mark.usecase33
+def test_mapped_snapshot_byte_order_round_trip(tmp_path, monkeypatch):
+    import types
+    import snapshot
+
+    system = AddressBookSystem()
+    system.add_address_book("Work")
+    system.books["Work"].add_contact(make_contact(city="Pune"))
+    # Pretend to be a big-endian host: the writer byteswaps to little-endian
+    # and the reader must swap back.
+    monkeypatch.setattr(snapshot, "sys", types.SimpleNamespace(byteorder="big"))
+    snapshot.write_snapshot(system, tmp_path / "books.snap")
+    with snapshot.MappedSnapshot(tmp_path / "books.snap") as mapped:
+        assert [(name, c.first_name) for name, c in mapped.search("city", "PUNE")] == [("Work", "Asha")]
+        assert mapped.count_by("city") == {"Pune": 1}
+        assert mapped.books["Work"].find_contact("asha", "nair").city == "Pune"
+
+@pytest.mark.usecase34
+def test_bulk_update_and_delete():
+    ab = AddressBook()
+    for name, city in (("Asha", "Pune"), ("Bina", "Kochi"), ("Chitra", "pune"), ("Devi", "Kochi")):
+        ab.add_contact(make_contact(name, city=city))
+    ab.sort_by_state()
+    assert ab.bulk_update({"city": "PUNE"}, {"state": "Maharashtra"}) == 2
+    assert [c.first_name for c in ab.sort_by_state()] == ["Bina", "Devi", "Asha", "Chitra"]
+    with pytest.raises(ValueError):
+        ab.bulk_update({"city": "Kochi"}, {"first_name": "Same"})
+    with pytest.raises(ValueError):
+        ab.bulk_update({"city": "Kochi"}, {"zip_code": "12", "state": "Goa"})
+    assert [c.state for c in ab.contacts] == ["Maharashtra", "Kerala", "Maharashtra", "Kerala"]
+    with pytest.raises(ValueError):
+        ab.bulk_delete({"town": "Kochi"})
+
+    assert ab.bulk_delete(lambda c: c.first_name in ("Asha", "Devi")) == 2
+    assert [c.first_name for c in ab.contacts] == ["Bina", "Chitra"]
+    assert ab.find_contact("chitra", "nair") is ab.contacts[1] and ab.find_contact("Asha", "Nair") is None
+
+@pytest.mark.usecase34
+@pytest.mark.parametrize("columnar", [False, True])
+def test_system_bulk_changes_use_indexes(columnar):
+    from columnar_store import ColumnarAddressBook
+
+    system = AddressBookSystem(book_factory=ColumnarAddressBook if columnar else AddressBook)
+    for book_name, entries in (("Work", (("Asha", "Pune"), ("Bina", "Kochi"))),
+                               ("Home", (("Chitra", "Pune"), ("Devi", "Kochi")))):
+        system.add_address_book(book_name)
+        for name, city in entries:
+            system.books[book_name].add_contact(make_contact(name, city=city))
+    assert system.bulk_update({"city": "pune", "zip_code": "682001"}, {"state": "Maharashtra", "zip_code": "411001"}) == 2
+    assert system.count_by_state() == {"Maharashtra": 2, "Kerala": 2}
+    assert sorted(c.first_name for _, c in system.search_by_zip("411001")) == ["Asha", "Chitra"]
+    assert system.bulk_delete({"state": "maharashtra"}) == 2
+    assert system.bulk_delete(lambda c: c.first_name == "Bina") == 1
+    assert [(b, c.first_name) for b, c in system.search_by_city("kochi")] == [("Home", "Devi")]
+
+@pytest.mark.usecase34
+def test_columnar_bulk_delete_compacts_once(monkeypatch):
+    from columnar_store import ColumnarAddressBook
+
+    book = ColumnarAddressBook()
+    for name in ("Asha", "Bina", "Chitra", "Devi", "Esha"):
+        book.add_contact(make_contact(name, city="Pune" if name in ("Bina", "Devi") else "Kochi"))
+    compactions = []
+    original = book._compact
+    monkeypatch.setattr(book, "_compact", lambda: compactions.append(1) or original())
+
+    assert book.bulk_delete({"city": "pune"}) == 2
+    assert len(compactions) == 1 and not book._dead and len(book.columns["email"].starts) == 3
+    assert [c.first_name for c in book.contacts] == ["Asha", "Chitra", "Esha"]
+    assert book.find_contact("Esha", "Nair").first_name == "Esha" and book.count_by_city() == {"Kochi": 3}
+
+@pytest.mark.usecase35
+def test_cross_book_dedup_and_merge():
+    from dedup import apply_merge_plans, find_duplicates, soundex
+
+    assert soundex("Robert") == soundex("Rupert") == "R163" and soundex("Ashcraft") == "A261"
+    system = AddressBookSystem()
+    system.add_address_book("Work")
+    system.add_address_book("Home")
+    work, home = system.books["Work"], system.books["Home"]
+    work.add_contact(make_contact("Asha", address="1 Old Rd"))
+    work.add_contact(make_contact("Ravi", "Kumar", zip_code="560001", phone_number="+91 9000000001"))
+    work.add_contact(make_contact("Mohammed", "Ali", zip_code="600001", phone_number="+91 9000000002"))
+    home.add_contact(make_contact("ASHA", "nair"))                                      # Same name.
+    home.add_contact(make_contact("Ravindra", "Kumar", phone_number="+919000000001"))   # Same phone.
+    home.add_contact(make_contact("Mohammad", "Ali", zip_code="600001", phone_number="+91 9000000003"))  # Similar.
+    home.add_contact(make_contact("Zoya", "Khan", zip_code="110001", phone_number="+91 9000000004"))
+
+    plans = find_duplicates(system)
+    assert [(p.keep[1].first_name, [c.first_name for _, c in p.duplicates], p.reasons) for p in plans] == [
+        ("Asha", ["ASHA"], {"name", "phone", "email"}),
+        ("Ravi", ["Ravindra"], {"phone"}),
+        ("Mohammed", ["Mohammad"], {"similar_name"}),
+    ]
+    assert plans[0].updates == {} and plans[1].updates == {}
+    assert apply_merge_plans(system, plans) == 3
+    assert [c.first_name for c in home.contacts] == ["Zoya"]
+    assert work.find_contact("Asha", "Nair").address == "1 Old Rd"
+    assert find_duplicates(system) == []
+
+@pytest.mark.usecase36
+def test_paginated_listings(monkeypatch, capsys):
+    from main import page_through
+
+    system = AddressBookSystem()
+    system.add_address_book("Work")
+    system.add_address_book("Home")
+    work = system.books["Work"]
+    for name, city in (("Esha", "Pune"), ("Bina", "Kochi"), ("Devi", "pune"), ("Asha", "Delhi"), ("Chitra", "Pune")):
+        work.add_contact(make_contact(name, city=city))
+    system.books["Home"].add_contact(make_contact("Farah", city="Kochi"))
+
+    page, cursor = work.list_page(cursor=0, page_size=2)
+    assert [c.first_name for c in page] == ["Esha", "Bina"] and cursor == 2
+    page, cursor = work.list_page("name", cursor=4, page_size=2)
+    assert [c.first_name for c in page] == ["Esha"] and cursor is None
+    assert [[c.first_name for c in p] for p in work.iter_pages("city", page_size=2)] == [
+        ["Asha", "Bina"], ["Esha", "Devi"], ["Chitra"]]
+    assert list(AddressBook().iter_pages()) == []
+
+    assert [[c.first_name for _, c in p] for p in system.iter_search_pages("city", "PUNE", page_size=2)] == [
+        ["Esha", "Devi"], ["Chitra"]]
+    entries = [entry for p in system.iter_grouped_pages("city", page_size=4) for entry in p]
+    assert [(value, c.first_name) for value, _, c in entries] == [
+        ("Pune", "Esha"), ("Pune", "Chitra"), ("pune", "Devi"), ("Kochi", "Bina"), ("Kochi", "Farah"), ("Delhi", "Asha")]
+
+    answers = iter(["", "q"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+    assert page_through(work.iter_pages(page_size=2), lambda c: print(c.first_name)) is True
+    assert capsys.readouterr().out.split() == ["Esha", "Bina", "Devi", "Asha"]
+    assert page_through(AddressBook().iter_pages(), print) is False
+
+@pytest.mark.usecase36
+def test_search_pages_are_read_lazily(monkeypatch):
+    import address_book_system
+
+    monkeypatch.setattr(address_book_system, "PAGE_SIZE", 2)
+    system = AddressBookSystem()
+    system.add_address_book("Work")
+    work = system.books["Work"]
+    for name in ("Asha", "Bina", "Chitra", "Devi", "Esha"):
+        work.add_contact(make_contact(name, city="Pune"))
+    reads = []
+    original = system._bucket_entries
+    monkeypatch.setattr(system, "_bucket_entries", lambda *args: reads.append(args[2]) or original(*args))
+
+    pages = system.iter_search_pages("city", "pune", page_size=2)
+    assert [c.first_name for _, c in next(pages)] == ["Asha", "Bina"]
+    assert len(reads) == 1 and len(reads[0]) == 2
+    work.delete_contact_by_name("Asha", "Nair")
+    work.delete_contact_by_name("Devi", "Nair")
+    assert [[c.first_name for _, c in page] for page in pages] == [["Chitra", "Esha"]]
+
+@pytest.mark.usecase37
+def test_contact_rendering_is_cached_until_a_field_changes(tmp_path):
+    ab = AddressBook()
+    contact = make_contact()
+    ab.add_contact(contact)
+    rendered = str(contact)
+    assert str(contact) is rendered and ab.list_contacts() == [rendered]
+
+    ab.edit_contact_by_name("Asha", "Nair", {"city": "Pune"})
+    assert "Pune" in str(contact) and "Kochi" not in str(contact)
+    ab.bulk_update({"city": "Pune"}, {"state": "Maharashtra"})
+    assert "Pune, Maharashtra" in ab.list_contacts()[0]
+    contact.phone_number = "+91 9000000000"
+    ab.export_to_txt(tmp_path / "book.txt")
+    assert "+91 9000000000" in (tmp_path / "book.txt").read_text()
+
+    trusted = Contact.from_trusted(make_contact("Bina").model_dump())
+    assert str(trusted) == str(make_contact("Bina"))
+    trusted.email = "bina@work.com"
+    assert str(trusted).endswith("bina@work.com") and "_rendered" not in trusted.model_dump()
+
+@pytest.mark.usecase37
+def test_copied_contacts_render_their_own_fields():
+    import copy
+
+    contact = make_contact()
+    assert "Kochi" in str(contact)
+    moved = contact.model_copy(update={"city": "Pune"})
+    assert moved.city == "Pune" and "Pune" in str(moved) and "Kochi" not in str(moved)
+    assert "Mumbai" in str(contact.model_copy(update={"city": "Mumbai"}, deep=True))
+    clone = copy.copy(contact)
+    clone.__dict__["state"] = "Goa"
+    assert "Goa" in str(clone) and "Goa" not in str(contact)
+    assert str(copy.deepcopy(contact)) == str(contact)
+
+@pytest.mark.usecase38
+def test_startup_defers_heavy_imports():
+    import subprocess
+    import sys
+    from pathlib import Path
+    from benchmark import compare_results, run_benchmarks
+
+    script = ("import sys, main; "
+              "print(sorted(m for m in ('json', 'orjson', 'email_validator', 'pydantic.networks') if m in sys.modules))")
+    loaded = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).parent).stdout
+    assert loaded.strip() == "[]"
+
+    # Validation and JSON still work once needed.
+    contact = make_contact(email="Asha@Mail.COM")
+    assert contact.email == "Asha@mail.com"
+    with pytest.raises(ValueError):
+        AddressBook.validate_email("not-an-email")
+
+    results = run_benchmarks(sizes=(1000,), names=["import_main"], repeat=1)
+    assert list(results["results"]) == ["import_main"] and results["results"]["import_main"]["seconds"] > 0
+    slower = {"results": {"import_main": {"seconds": results["results"]["import_main"]["seconds"] * 2}}}
+    assert [key for key, _, _ in compare_results(results, slower)] == ["import_main"]
+
+@pytest.mark.usecase39
+def test_batch_cli_streams_contacts_through_the_database(tmp_path, monkeypatch, capsys):
+    import io
+    import json
+    from main import run_batch
+
+    db = str(tmp_path / "books.db")
+
+    def run(*argv, stdin=""):
+        monkeypatch.setattr("sys.stdin", io.StringIO(stdin))
+        status = run_batch(["--db", db, "--batch-size", "2", *argv])
+        return status, capsys.readouterr()
+
+    rows = [make_contact(name, city=city).model_dump() for name, city in
+            (("Asha", "Pune"), ("Bina", "Kochi"), ("Chitra", "pune"))]
+    stdin = "\n".join(json.dumps(row) for row in rows + [rows[0], {"first_name": "x"}]) + "\n"
+    status, captured = run("add", "Work", stdin=stdin)
+    report = json.loads(captured.out)
+    assert status == 0 and captured.err == ""
+    assert (report["rows"], report["imported"], report["duplicates"], report["error_count"]) == (5, 3, 1, 1)
+
+    csv_text = "first_name,last_name,address,city,state,zip_code,phone_number,email\n" \
+               "Devi,Nair,12 MG Road,Pune,Kerala,682001,+91 9876543211,devi@mail.com\n"
+    status, captured = run("add", "Home", "--format", "csv", stdin=csv_text)
+    assert json.loads(captured.out)["imported"] == 1
+
+    status, captured = run("search", "city", "PUNE")
+    found = [json.loads(line) for line in captured.out.splitlines()]
+    assert sorted((entry["book"], entry["contact"]["first_name"]) for entry in found) == [
+        ("Home", "Devi"), ("Work", "Asha"), ("Work", "Chitra")]
+    assert json.loads(run("count", "city")[1].out) == {"Pune": 2, "Kochi": 1, "pune": 1}
+
+    status, captured = run("export", "Work")
+    assert [json.loads(line)["first_name"] for line in captured.out.splitlines()] == ["Asha", "Bina", "Chitra"]
+    (tmp_path / "work.ndjson").write_text(captured.out)
+    status, captured = run("import", "Copy", str(tmp_path / "work.ndjson"))
+    assert json.loads(captured.out)["imported"] == 3 and "imported" in captured.err
+
+    # The Work and Copy contacts share make_contact's phone number; Devi does not.
+    status, captured = run("dedupe", "--apply")
+    plan, = [json.loads(line) for line in captured.out.splitlines()]
+    assert plan["keep"]["contact"]["first_name"] == "Asha" and "phone" in plan["reasons"]
+    assert len(plan["duplicates"]) == 5 and "deleting 5" in captured.err
+    assert run("export", "Copy", "--format", "csv")[1].out.splitlines() == [
+        "first_name,last_name,address,city,state,zip_code,phone_number,email"]
+
+    status, captured = run("export", "Missing")
+    assert status == 1 and "not found" in captured.err and captured.out == ""
+
+@pytest.mark.usecase40
+@pytest.mark.parametrize("columnar", [False, True])
+def test_composable_query_planner(columnar):
+    from columnar_store import ColumnarAddressBook
+    from query import Between, Eq, InBooks, Prefix
+
+    system = AddressBookSystem(book_factory=ColumnarAddressBook) if columnar else AddressBookSystem()
+    system.add_address_book("Work")
+    system.add_address_book("Home")
+    for first, last, city, zip_code in (("Asha", "Nair", "Pune", "411001"), ("Bina", "Naik", "pune", "411050"),
+                                        ("Chitra", "Rao", "Pune", "411200"), ("Devi", "Nanda", "Kochi", "682001")):
+        system.get_address_book("Work").add_contact(make_contact(first, last, city=city, zip_code=zip_code))
+    system.get_address_book("Home").add_contact(make_contact("Esha", "Nair", city="Pune", zip_code="411002"))
+
+    def names(query):
+        return [(book_name, contact.first_name) for book_name, contact in query]
+
+    query = system.query(city="PUNE").where(Between("zip_code", "411000", "411099") | Prefix("last_name", "ra"))
+    assert sorted(names(query)) == [("Home", "Esha"), ("Work", "Asha"), ("Work", "Bina"), ("Work", "Chitra")]
+    assert names(query.where(InBooks("Work")).order_by("zip_code", descending=True).limit(2)) == [
+        ("Work", "Chitra"), ("Work", "Bina")]
+    assert names(system.query(Prefix("last_name", "NA")).order_by("last_name", "first_name")) == [
+        ("Work", "Bina"), ("Work", "Asha"), ("Home", "Esha"), ("Work", "Devi")]
+    assert system.query(Eq("state", "kerala")).limit(3).count() == 3
+
+    lines = query.limit(2).explain().splitlines()
+    assert lines[0] == "Limit 2 (est. 2 rows)"
+    assert lines[-1].strip() == "Index lookup city = 'pune' (est. 4 rows)"
+    assert "Name lookup 'esha' 'NAIR' in 2 book(s)" in system.query(first_name="esha", last_name="NAIR").explain()
+    assert names(system.query(first_name="esha", last_name="NAIR")) == [("Home", "Esha")]
+    assert system.query(InBooks("Home")).explain().endswith("Scan books 'Home' (est. 1 rows)")
+
+    zips = system.query(Eq("zip_code", "411001") | Eq("zip_code", "682001")).explain()
+    assert "Union (est. 2 rows)" in zips and zips.count("Index lookup") == 2
+    ranged = system.query(Between("zip_code", "411000", "411099")).explain()
+    # Only the in-memory indexes answer ranges; columnar books are scanned.
+    assert ranged.endswith("Scan all books (est. 5 rows)" if columnar else "(est. 3 rows)")
+
+    with pytest.raises(ValueError):
+        system.query(nickname="Ash")
+    with pytest.raises(ValueError):
+        system.query().order_by("age")
+
+@pytest.mark.usecase40
+def test_query_on_stored_contacts(tmp_path):
+    from query import Eq, InBooks
+    from sqlite_storage import SQLiteStorage
+
+    with SQLiteStorage(tmp_path / "book.db") as storage:
+        system = AddressBookSystem(storage=storage)
+        system.add_address_book("Work")
+        system.add_address_book("Home")
+        for book_name in ("Work", "Home"):
+            book = system.get_address_book(book_name)
+            book.add_contact(make_contact("Asha", city="Pune", state="MH"))
+            book.add_contact(make_contact("Bina", city="Pune", state="Kerala"))
+            book.add_contact(make_contact("Chitra", city="Mumbai", state="MH"))
+            book.add_contact(make_contact("Devi", city="Kochi", state="Kerala"))
+
+    with SQLiteStorage(tmp_path / "book.db") as storage:
+        system = AddressBookSystem(storage=storage)
+        query = system.query(Eq("city", "Pune") | Eq("state", "MH"))
+        assert "Union" in query.explain()
+        assert sorted((book_name, c.first_name) for book_name, c in query.all()) == [
+            ("Home", "Asha"), ("Home", "Bina"), ("Home", "Chitra"),
+            ("Work", "Asha"), ("Work", "Bina"), ("Work", "Chitra")]
+        assert query.count() == 6
+        assert system.query(InBooks("Home")).explain().endswith("Scan books 'Home' (est. 4 rows)")
+
+        def no_scan(book_names=None):
+            raise AssertionError("an index lookup needs no scan estimate")
+
+        system._entry_count = no_scan
+        assert system.query(Eq("city", "pune")).explain().endswith("(est. 4 rows)")
+
+@pytest.mark.usecase30
+def test_service_writer_survives_malformed_updates():
+    import asyncio
+    from service import AddressBookService
+
+    async def scenario():
+        service = AddressBookService()
+        await service.start()
+        try:
+            service.system.add_address_book("Work")
+            service.system.books["Work"].add_contact(make_contact())
+            responses = await asyncio.wait_for(asyncio.gather(
+                service.handle({"id": 1, "op": "edit", "book": "Work", "first_name": "Asha", "last_name": "Nair",
+                                "updates": {"city": 5}}),
+                service.handle({"id": 2, "op": "edit", "book": "Work", "first_name": "Asha", "last_name": "Nair",
+                                "updates": ["city"]}),
+                service.handle({"id": 3, "op": "add", "book": "Work", "contact": make_contact("Bina").model_dump()}),
+            ), timeout=10)
+        finally:
+            await service.close()
+        return responses
+
+    bad_value, bad_updates, added = asyncio.run(scenario())
+    assert bad_value == {"id": 1, "ok": False, "error": "The new value of 'city' must be text."}
+    assert bad_updates["ok"] is False and "dictionary" in bad_updates["error"]
+    assert added == {"id": 3, "ok": True, "result": {"added": True}}
+
+@pytest.mark.usecase30
+def test_service_requests_go_through_the_public_api():
+    import asyncio
+    import metrics
+    from service import AddressBookService
+
+    async def scenario(service):
+        await service.start()
+        try:
+            requests = [
+                {"op": "add_book", "book": "Work"},
+                {"op": "add", "book": "Work", "contact": make_contact(city="Pune").model_dump()},
+                {"op": "add", "book": "Work", "contact": make_contact(city="Pune").model_dump()},
+                {"op": "import", "book": "Work", "contacts": [make_contact("Bina", city="Pune").model_dump()]},
+                {"op": "search", "field": "city", "value": "pune"},
+                {"op": "count", "field": "zip"},
+            ]
+            return [await asyncio.wait_for(service.handle(request), timeout=10) for request in requests]
+        finally:
+            await service.close()
+
+    metrics.reset()
+    metrics.enable()
+    try:
+        responses = asyncio.run(scenario(AddressBookService()))
+    finally:
+        metrics.disable()
+    assert [r["result"] for r in responses[1:3]] == [{"added": True}, {"added": False}]
+    assert [entry["contact"]["first_name"] for entry in responses[4]["result"]] == ["Asha", "Bina"]
+    assert responses[5]["result"] == {"682001": 2}
+    stats = metrics.snapshot()
+    assert stats["AddressBook.add_contact"]["calls"] == 2
+    assert stats["AddressBook.import_records"]["rows"] == 1
+    assert stats["AddressBookSystem.search"]["hits"] == 1 and stats["AddressBookSystem.count_by"]["calls"] == 1
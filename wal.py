@@ -0,0 +1,297 @@
+"""
+wal.py
+
+Durable persistence for an AddressBookSystem through a write-ahead log.
+
+A WriteAheadLog observes the system and appends one compact JSON record per
+change (book added, contact added, edited or deleted) to `wal.log`, so saving
+a change costs O(1) instead of rewriting an export. Every record carries a
+sequence number. Compaction writes all contacts to a snapshot,
+`snapshot.jsonl`, of JSON lines like the log records, and then drops the
+records it includes from the log. On startup the snapshot is loaded and only
+the log records newer than it are replayed.
+
+Automatic compaction (`compact_every`) starts after the change that triggers
+it has been logged. On a system whose books can be frozen, such as
+ThreadSafeAddressBookSystem, it runs on a background thread, so the lock the
+change holds is not kept while the snapshot is written.
+
+A record that was only partly written when the process died is detected on
+recovery and cut off; every complete record before it is kept.
+
+Classes:
+- WriteAheadLog: The log, and the entry point to open a durable system.
+"""
+
+import os
+import threading
+
+from address_book_system import (AddressBook, AddressBookObserver, AddressBookSystem, Contact,
+                                 _CONTACT_FIELDS, _gc_paused, json_dumps, json_loads)
+
+LOG_NAME = "wal.log"
+SNAPSHOT_NAME = "snapshot.jsonl"
+SNAPSHOT_VERSION = 2
+
+# Record types.
+BOOK_ADDED = "b"
+CONTACT_ADDED = "a"
+CONTACT_UPDATED = "u"
+CONTACT_REMOVED = "d"
+
+
+class WriteAheadLog(AddressBookObserver):
+    """
+    Appends every change of an AddressBookSystem to a log file.
+
+    Use `WriteAheadLog.open(directory)` to recover a system and start logging
+    its changes, and `close()` when done.
+
+    Attributes:
+        directory (str): The directory holding the log and the snapshot.
+        system (AddressBookSystem): The system being logged.
+        seq (int): The sequence number of the last record written.
+        fsync (bool): Whether each record is forced to disk before the change
+            returns. Without it, records reach the operating system at once
+            but may be lost if the machine, not just the process, crashes.
+        compact_every (int or None): Compact automatically after this many
+            records.
+    """
+
+    def __init__(self, directory, system, seq=0, fsync=False, compact_every=None):
+        """
+        Starts logging to `directory`. Use `open` instead, which recovers the
+        system first.
+        """
+        self.directory = directory
+        self.system = system
+        self.seq = seq
+        self.fsync = fsync
+        self.compact_every = compact_every
+        self._records_since_compaction = 0
+        self._file = open(self._path(LOG_NAME), "a", encoding="utf-8")
+        # Guards the log file, which a background compaction rewrites.
+        self._file_lock = threading.Lock()
+        self._compaction = None
+
+    @classmethod
+    def open(cls, directory, fsync=False, compact_every=None, book_factory=AddressBook):
+        """
+        Recovers the system stored in `directory` from its snapshot and log,
+        and starts logging its changes.
+
+        Args:
+            directory (str): The directory holding the log and the snapshot;
+                created if it does not exist.
+            fsync (bool): Force each record to disk before the change returns.
+            compact_every (int, optional): Compact automatically after this
+                many records.
+            book_factory (type): The AddressBook class used for the books.
+
+        Returns:
+            WriteAheadLog: The log; the recovered system is its `system`.
+        """
+        os.makedirs(directory, exist_ok=True)
+        system = AddressBookSystem(book_factory=book_factory)
+        with _gc_paused():
+            seq = _load_snapshot(os.path.join(directory, SNAPSHOT_NAME), system)
+            seq = _replay(os.path.join(directory, LOG_NAME), system, seq)
+        wal = cls(directory, system, seq, fsync, compact_every)
+        system.add_observer(wal)
+        return wal
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    # Logging
+    def _append(self, record):
+        with self._file_lock:
+            self.seq += 1
+            self._file.write(json_dumps([self.seq, *record]) + "\n")
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        self._records_since_compaction += 1
+        if self.compact_every and self._records_since_compaction >= self.compact_every:
+            self._start_compaction()
+
+    def _start_compaction(self):
+        """
+        Compacts once the change being logged is complete: on a background
+        thread if the system's books can be frozen, at once otherwise.
+        """
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        if hasattr(self.system, "_with_books_frozen"):
+            self._compaction = threading.Thread(target=self.compact, name="wal-compaction")
+            self._compaction.start()
+        else:
+            self.compact()
+
+    def book_added(self, book_name):
+        self._append((BOOK_ADDED, book_name))
+
+    def contact_added(self, book_name, contact):
+        self._append((CONTACT_ADDED, book_name, [getattr(contact, field) for field in _CONTACT_FIELDS]))
+
+    def contact_removed(self, book_name, contact):
+        self._append((CONTACT_REMOVED, book_name, contact.first_name, contact.last_name))
+
+    def contact_updated(self, book_name, contact, old_values):
+        self._append((CONTACT_UPDATED, book_name,
+                      old_values.get("first_name", contact.first_name),
+                      old_values.get("last_name", contact.last_name),
+                      {field: getattr(contact, field) for field in old_values}))
+
+    # Compaction
+    def compact(self):
+        """
+        Writes every contact to a new snapshot and drops the records it
+        includes from the log.
+
+        The contacts are read with every book frozen, if the system supports
+        it, and the snapshot is then written without holding any lock. It is
+        written to a temporary file and renamed into place, so a crash leaves
+        either the old or the new snapshot. It records the sequence number it
+        includes, so records still in the log after such a crash are not
+        replayed twice.
+        """
+        freeze = getattr(self.system, "_with_books_frozen", lambda func: func())
+        seq, offset, books = freeze(self._capture)
+        temporary = self._path(SNAPSHOT_NAME + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(json_dumps({"version": SNAPSHOT_VERSION, "seq": seq, "fields": _CONTACT_FIELDS}) + "\n")
+            for name, rows in books.items():
+                file.write(json_dumps([name, len(rows)]) + "\n")
+                file.writelines(json_dumps(row) + "\n" for row in rows)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self._path(SNAPSHOT_NAME))
+        self._truncate_log(offset)
+
+    def _capture(self):
+        """
+        Returns:
+            tuple: (seq, offset, books): the last sequence number logged, the
+            end of its record in the log, and the field values of every
+            contact per book.
+        """
+        with self._file_lock:
+            self._file.flush()
+            seq, offset = self.seq, self._file.tell()
+            self._records_since_compaction = 0
+        books = {name: [[getattr(c, field) for field in _CONTACT_FIELDS] for c in book.contacts]
+                 for name, book in self.system.books.items()}
+        return seq, offset, books
+
+    def _truncate_log(self, offset):
+        """
+        Drops the first `offset` bytes of the log, keeping the records written
+        after them.
+        """
+        temporary = self._path(LOG_NAME + ".tmp")
+        with self._file_lock:
+            self._file.close()
+            with open(self._path(LOG_NAME), "rb") as log, open(temporary, "wb") as file:
+                log.seek(offset)
+                file.write(log.read())
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, self._path(LOG_NAME))
+            self._file = open(self._path(LOG_NAME), "a", encoding="utf-8")
+
+    def flush(self):
+        """
+        Forces the records written so far to disk.
+        """
+        with self._file_lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """
+        Waits for a background compaction to finish, forces the log to disk
+        and closes it.
+        """
+        if self._compaction is not None:
+            self._compaction.join()
+        self.flush()
+        self._file.close()
+
+
+def _load_snapshot(path, system):
+    """
+    Loads a snapshot into an empty system.
+
+    Returns:
+        int: The sequence number of the last record included in the snapshot,
+        or 0 if there is no snapshot.
+    """
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return 0
+    with file:
+        header = json_loads(file.readline())
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {header.get('version')!r} in '{path}'.")
+        fields = header["fields"]
+        from_trusted = Contact.from_trusted
+        for line in file:
+            name, count = json_loads(line)
+            system.add_address_book(name)
+            system.books[name]._insert_many([from_trusted(dict(zip(fields, json_loads(next(file)))))
+                                             for _ in range(count)])
+    return header["seq"]
+
+
+def _replay(path, system, seq):
+    """
+    Applies the log records newer than `seq` to the system, and cuts off a
+    trailing record that was only partly written.
+
+    Returns:
+        int: The sequence number of the last record in the log, or `seq` if
+        the log holds nothing newer.
+    """
+    try:
+        file = open(path, "r+b")
+    except FileNotFoundError:
+        return seq
+    with file:
+        good_end = 0
+        for line in file:
+            try:
+                record = json_loads(line) if line.endswith(b"\n") else None
+            except ValueError:
+                record = None
+            if record is None:
+                break
+            good_end += len(line)
+            record_seq, kind, book_name, *args = record
+            if record_seq <= seq:
+                continue
+            seq = record_seq
+            _apply(system, kind, book_name, args)
+        file.truncate(good_end)
+    return seq
+
+
+def _apply(system, kind, book_name, args):
+    """
+    Applies one log record to the system.
+    """
+    if kind == BOOK_ADDED:
+        if book_name not in system.books:
+            system.add_address_book(book_name)
+        return
+    book = system.books[book_name]
+    if kind == CONTACT_ADDED:
+        book._insert(Contact.from_trusted(dict(zip(_CONTACT_FIELDS, args[0]))))
+    elif kind == CONTACT_REMOVED:
+        book.delete_contact_by_name(*args)
+    elif kind == CONTACT_UPDATED:
+        first_name, last_name, changes = args
+        book.edit_contact_by_name(first_name, last_name, changes)
+    else:
+        raise ValueError(f"Unknown log record type {kind!r}.")